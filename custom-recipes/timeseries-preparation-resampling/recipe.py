@@ -1,15 +1,25 @@
 # -*- coding: utf-8 -*-
 
+import itertools
+
+import pandas as pd
 from dataiku.customrecipe import get_recipe_config
 
 from dku_timeseries import Resampler
-from io_utils import get_input_output
+from dku_timeseries.resampling import TIME_STEP_COLUMN
+from dku_timeseries.dataframe_helpers import get_time_range, get_last_timestamps, drop_rows_until
+from dku_timeseries.memory_helpers import log_stage_memory
+from io_utils import get_input_output, get_output_folder, get_dataset_outside_flow, load_state, save_state
 from recipe_config_loading import check_and_get_groupby_columns, check_time_column_parameter, check_python_version, get_resampling_params
 
 import inspect
 
 check_python_version()
 
+RESAMPLING_STATE_PATH = 'resampling_state.pkl'
+# set while the rows of an incremental run are appended to the output, until its state is saved
+WRITE_PENDING_PATH = 'resampling_write_pending.pkl'
+
 # --- Setup
 (input_dataset, output_dataset) = get_input_output()
 recipe_config = get_recipe_config()
@@ -18,7 +28,13 @@ input_dataset_columns = [column["name"] for column in schema]
 check_time_column_parameter(recipe_config, input_dataset_columns)
 groupby_columns = check_and_get_groupby_columns(recipe_config, input_dataset_columns)
 datetime_column = recipe_config.get('datetime_column')
-params = get_resampling_params(recipe_config)
+
+streaming_activated = recipe_config.get('streaming_activated', False)
+chunk_size = int(recipe_config.get('chunk_size', 100000))
+incremental_activated = recipe_config.get('incremental_activated', False)
+state_folder = get_output_folder('state_folder')
+if incremental_activated and state_folder is None:
+    raise ValueError('Incremental resampling requires an incremental state folder as output.')
 
 # use_nullable_integers is only available in DSS >= 13.1
 # Prior to this, the plugin does not support integer columns with NaN values
@@ -26,23 +42,81 @@ signature = inspect.signature(input_dataset.get_dataframe)
 can_use_nullable_integers = "use_nullable_integers" in signature.parameters
 
 if can_use_nullable_integers:
-    df = input_dataset.get_dataframe(infer_with_pandas=False, use_nullable_integers=True, bool_as_str=True)
+    read_kwargs = {"infer_with_pandas": False, "use_nullable_integers": True, "bool_as_str": True}
 else:
-    df = input_dataset.get_dataframe(infer_with_pandas=False)
+    read_kwargs = {"infer_with_pandas": False}
 
-resampler = Resampler(params)
-output_df = resampler.transform(df, datetime_column, groupby_columns=groupby_columns)
-
-# int columns must be resampled into int values
+# int columns must be resampled into int values, they are rounded column by column by the resampler
 dss_expected_integer_columns = [
     column["name"]
     for column in schema
     if column["type"] in ["tinyint", "smallint", "int", "bigint"]
 ]
-columns_to_round = [c for c in df.select_dtypes(include="inexact").columns if c in dss_expected_integer_columns]
-output_df[columns_to_round] = output_df[columns_to_round].round()
+params = get_resampling_params(recipe_config, integer_columns=dss_expected_integer_columns)
+resampler = Resampler(params)
+# with several time steps, the output has an additional column with the time step of each row
+output_schema = schema if len(params.time_steps) == 1 else schema + [{"name": TIME_STEP_COLUMN, "type": "double"}]
 
+if streaming_activated:
+    # a first pass on the time column gives the time range of the whole dataset,
+    # then each time series is resampled and written as soon as its last row has been read
+    start_time, end_time, rows_number = get_time_range(input_dataset.iter_dataframes(chunksize=chunk_size, columns=[datetime_column], **read_kwargs),
+                                                       datetime_column)
+    chunks = iter(input_dataset.iter_dataframes(chunksize=chunk_size, **read_kwargs))
+    first_chunk = next(chunks, pd.DataFrame(columns=input_dataset_columns))
+
+    if rows_number < 2:
+        output_chunks = (chunk.dropna(subset=[datetime_column]) for chunk in itertools.chain([first_chunk], chunks))
+    else:
+        output_chunks = resampler.transform_chunks(itertools.chain([first_chunk], chunks), datetime_column, start_time, end_time,
+                                                   groupby_columns=groupby_columns)
+
+    if params.downsampling_method == 'interpolation':
+        output_dataset.write_schema(output_schema)
+    else:
+        # aggregates have their own types and the open/high/low/close method adds columns, so the schema comes from the first output chunk
+        first_output_chunk = next(output_chunks)
+        output_dataset.write_schema_from_dataframe(first_output_chunk)
+        output_chunks = itertools.chain([first_output_chunk], output_chunks)
+    with output_dataset.get_writer() as writer:
+        for output_chunk in output_chunks:
+            writer.write_dataframe(output_chunk)
+    log_stage_memory('resampling by chunks')
+elif incremental_activated:
+    state = load_state(state_folder, RESAMPLING_STATE_PATH)
+    # the input is read by chunks, and only the rows appended since the previous run are kept
+    chunks = iter(input_dataset.iter_dataframes(chunksize=chunk_size, **read_kwargs))
+    first_chunk = next(chunks, pd.DataFrame(columns=input_dataset_columns))
+    df = resampler.select_new_rows(itertools.chain([first_chunk], chunks), datetime_column, state=state, groupby_columns=groupby_columns)
+    log_stage_memory('reading the new rows')
+    output_df, new_state = resampler.transform_incremental(df, datetime_column, state=state, groupby_columns=groupby_columns)
+
+    if load_state(state_folder, WRITE_PENDING_PATH):
+        # the previous run failed after starting to append its rows and before saving its state, so its rows are computed again:
+        # the ones that were appended are dropped, from the last timestamp of each time series in the output
+        written_chunks = get_dataset_outside_flow(output_dataset).iter_dataframes(chunksize=chunk_size, columns=[datetime_column] + groupby_columns,
+                                                                                  **read_kwargs)
+        output_df = drop_rows_until(output_df, get_last_timestamps(written_chunks, datetime_column, groupby_columns), datetime_column,
+                                    groupby_columns)
+
+    # --- Write output: the state is saved after the rows are appended, and the pending write is only cleared after the state is saved,
+    # so that a run failing in between is computed again without appending its rows twice
+    output_dataset.write_schema(schema)
+    save_state(state_folder, WRITE_PENDING_PATH, True)
+    output_dataset.write_dataframe(output_df)
+    save_state(state_folder, RESAMPLING_STATE_PATH, new_state)
+    save_state(state_folder, WRITE_PENDING_PATH, False)
+    log_stage_memory('writing the output')
+else:
+    df = input_dataset.get_dataframe(**read_kwargs)
+    log_stage_memory('reading the input')
+    output_df = resampler.transform(df, datetime_column, groupby_columns=groupby_columns)
 
-# --- Write output
-output_dataset.write_schema(schema)
-output_dataset.write_dataframe(output_df)
+    # --- Write output
+    if params.downsampling_method == 'interpolation':
+        output_dataset.write_schema(output_schema)
+        output_dataset.write_dataframe(output_df)
+    else:
+        # aggregates have their own types and the open/high/low/close method adds columns
+        output_dataset.write_with_schema(output_df)
+    log_stage_memory('writing the output')
@@ -1,5 +1,10 @@
 # coding: utf-8
 import numpy as np
+import pandas as pd
+
+from dku_timeseries.timeseries_helpers import timestamps_to_int64
+
+NAT_INT64 = np.iinfo('int64').min
 
 
 # python3 does not have basetring
@@ -9,7 +14,47 @@ except NameError:
     basestring = str
 
 def has_duplicates(df, column):
-    return any(df.duplicated(subset=[column], keep=False))
+    """
+    Check if a column has duplicate values.
+    Datetime columns are compared as int64 timestamps: once sorted, the duplicates are equal consecutive values.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(df[column]):
+        return bool(df[column].duplicated(keep=False).any())
+    timestamps = timestamps_to_int64(df[column])
+    if not is_sorted(timestamps):
+        timestamps = np.sort(timestamps)
+    return bool(np.any(timestamps[1:] == timestamps[:-1]))
+
+
+def is_sorted(values):
+    """
+    Check if an array of int64 values (e.g. timestamps) is sorted in increasing order, in a single vectorized pass.
+    """
+    return bool(np.all(values[1:] >= values[:-1]))
+
+
+def is_sorted_by_time(timestamps):
+    # null timestamps are the smallest int64 value, while pandas sorts them last
+    timestamps = timestamps_to_int64(timestamps)
+    return is_sorted(timestamps) and (len(timestamps) == 0 or timestamps[0] != NAT_INT64)
+
+
+def sort_by_time(df, datetime_column):
+    """
+    Sort a dataframe by its datetime column, or return it as is when it is already sorted.
+    """
+    if is_sorted_by_time(df[datetime_column]):
+        return df
+    return df.sort_values(datetime_column, kind='mergesort')
+
+
+def sort_by_time_index(df):
+    """
+    Sort a dataframe by its datetime index, or return it as is when it is already sorted.
+    """
+    if is_sorted_by_time(df.index):
+        return df
+    return df.sort_index()
 
 
 def nothing_to_do(df, min_len=2):
@@ -17,11 +62,206 @@ def nothing_to_do(df, min_len=2):
 
 
 def filter_empty_columns(df, columns):
-    filtered_columns = []
-    for col in columns:
-        if np.sum(df[col].notnull()) > 1: # in fact we filter out columns with less than 2 values
-            filtered_columns.append(col)
-    return filtered_columns
+    # in fact we filter out columns with less than 2 values
+    counts = df[columns].notnull().sum()
+    return [col for col in columns if counts[col] > 1]
+
+
+def group_columns_by_observation_pattern(observed_mask):
+    """
+    Group the columns of a 2-D mask of the non-null values that have their non-null values at the same rows.
+    Returns a list of (positions of the columns, positions of the non-null values) tuples, in the order of first appearance of each pattern.
+    """
+    groups = {}
+    for i in range(observed_mask.shape[1]):
+        key = observed_mask[:, i].tobytes()
+        if key not in groups:
+            groups[key] = ([], np.flatnonzero(observed_mask[:, i]))
+        groups[key][0].append(i)
+    return list(groups.values())
+
+
+def is_resampleable_dtype(dtype):
+    """
+    Check if a column is interpolated as numerical values: integers and floats of any width, including the pandas nullable integers and
+    floats, and the pandas nullable booleans. numpy booleans and timedeltas are imputed as categories.
+    """
+    if isinstance(dtype, pd.BooleanDtype):
+        return True
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) and not pd.api.types.is_complex_dtype(dtype)
+
+
+def is_masked_dtype(dtype):
+    """
+    Check if a dtype is a pandas nullable integer, float or boolean, stored as numpy values and a mask of the null values.
+    """
+    return pd.api.types.is_extension_array_dtype(dtype) and getattr(dtype, 'kind', None) in 'iufb' and hasattr(dtype, 'numpy_dtype')
+
+
+def get_float_values(df, columns, dtype='float64'):
+    """
+    Convert numerical columns to a 2-D float array, the null values of the pandas nullable dtypes becoming NaN.
+    The columns are converted one by one, DataFrame.to_numpy not supporting na_value before pandas 1.1.
+    """
+    values = np.empty((len(df), len(columns)), dtype=dtype)
+    for i, column in enumerate(columns):
+        values[:, i] = df[column].to_numpy(dtype=dtype, na_value=np.nan)
+    return values
+
+
+def to_masked_array(values, dtype):
+    """
+    Convert an array of resampled float values to a pandas nullable array of the given dtype, with the null values masked.
+    Integer and boolean values are rounded, and clipped to the range of the dtype.
+    """
+    mask = np.isnan(values)
+    values = np.where(mask, 0, values)
+    if dtype.kind == 'b':
+        data = np.rint(np.clip(values, 0, 1)).astype(bool)
+    elif dtype.kind in 'iu':
+        bounds = np.iinfo(dtype.numpy_dtype)
+        data = np.rint(np.clip(values, bounds.min, bounds.max)).astype(dtype.numpy_dtype)
+    else:
+        data = values.astype(dtype.numpy_dtype)
+    return dtype.construct_array_type()(data, mask)
+
+
+def round_to_integers(values):
+    """
+    Round an array of resampled float values in place, and cast it to integers when it has no null values.
+    """
+    np.rint(values, out=values)
+    if np.isnan(values).any():
+        return values
+    return values.astype('int64')
+
+
+def forward_fill_codes(codes):
+    """
+    Replace the missing codes (-1) of an array of integer codes by the last previous valid code, as ffill.
+    """
+    last_valid_positions = np.where(codes >= 0, np.arange(len(codes)), -1)
+    np.maximum.accumulate(last_valid_positions, out=last_valid_positions)
+    return np.where(last_valid_positions >= 0, codes[last_valid_positions], -1)
+
+
+def backward_fill_codes(codes):
+    """
+    Replace the missing codes (-1) of an array of integer codes by the next valid code, as bfill.
+    """
+    return forward_fill_codes(codes[::-1])[::-1]
+
+
+def sort_by_segments(df, groupby_columns, datetime_column):
+    """
+    Sort the dataframe once by (identifiers, time) and find the boundaries of each time series.
+    Rows with a null identifier are dropped, as groupby does.
+    Returns the positions of the rows in the sorted order, the start and end positions of each segment in the sorted order,
+    and for each identifier the code of every segment and the unique values.
+    """
+    codes_list = []
+    uniques_list = []
+    for col in groupby_columns:
+        codes, uniques = pd.factorize(df[col], sort=True)
+        codes_list.append(codes)
+        uniques_list.append(uniques)
+    valid_rows = np.logical_and.reduce([codes >= 0 for codes in codes_list])
+    codes_list = [codes[valid_rows] for codes in codes_list]
+    timestamps = df[datetime_column].values[valid_rows].astype('datetime64[ns]').view('int64')
+
+    if is_lexicographically_sorted(codes_list + [timestamps]):
+        # the input is already sorted by identifiers and time
+        order = np.arange(len(timestamps))
+    else:
+        # np.lexsort sorts by the last key first
+        order = np.lexsort([timestamps] + codes_list[::-1])
+    codes_list = [codes[order] for codes in codes_list]
+    sorted_positions = np.flatnonzero(valid_rows)[order]
+
+    is_segment_start = np.zeros(len(sorted_positions), dtype=bool)
+    if len(sorted_positions) > 0:
+        is_segment_start[0] = True
+    for codes in codes_list:
+        is_segment_start[1:] |= codes[1:] != codes[:-1]
+    segment_starts = np.flatnonzero(is_segment_start)
+    segment_ends = np.append(segment_starts[1:], len(sorted_positions))
+    segment_codes = [codes[segment_starts] for codes in codes_list]
+    return sorted_positions, segment_starts, segment_ends, segment_codes, uniques_list
+
+
+def is_lexicographically_sorted(keys):
+    """
+    Check if rows are sorted by several arrays of int64 keys, the first key being the most significant.
+    """
+    # pairs of consecutive rows that are equal on the keys checked so far
+    is_tie = np.ones(max(len(keys[0]) - 1, 0), dtype=bool)
+    for key in keys:
+        if np.any(is_tie & (key[1:] < key[:-1])):
+            return False
+        is_tie &= key[1:] == key[:-1]
+    return True
+
+
+def split_segments_in_batches(segment_starts, segment_ends, batches_number):
+    """
+    Split consecutive segments into at most batches_number batches with roughly the same number of rows.
+    Returns a list of (first segment, last segment excluded) tuples covering all the segments in order.
+    """
+    total_rows = segment_ends[-1] - segment_starts[0] if len(segment_starts) > 0 else 0
+    row_targets = segment_starts[0] + total_rows * np.arange(1, batches_number) / float(batches_number)
+    boundaries = np.unique(np.concatenate([[0], np.searchsorted(segment_ends, row_targets, side='left') + 1, [len(segment_starts)]]))
+    boundaries = boundaries[boundaries <= len(segment_starts)]
+    return [(int(first), int(last)) for first, last in zip(boundaries[:-1], boundaries[1:]) if last > first]
+
+
+def get_time_range(chunks, datetime_column):
+    """
+    Compute the first and last timestamps of a dataset read in chunks, and its number of rows with a timestamp.
+    """
+    start_time, end_time, rows_number = None, None, 0
+    for chunk in chunks:
+        timestamps = pd.to_datetime(chunk[datetime_column]).dropna()
+        if len(timestamps) == 0:
+            continue
+        rows_number += len(timestamps)
+        start_time = timestamps.min() if start_time is None else min(start_time, timestamps.min())
+        end_time = timestamps.max() if end_time is None else max(end_time, timestamps.max())
+    return start_time, end_time, rows_number
+
+
+def get_last_timestamps(chunks, datetime_column, groupby_columns):
+    """
+    Compute the last timestamp of each time series of a dataset read in chunks, as a dataframe with the time series identifiers and the timestamp.
+    """
+    last_rows = pd.DataFrame(columns=groupby_columns + [datetime_column])
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=[datetime_column] + groupby_columns)
+        if len(chunk) == 0:
+            continue
+        with pd.option_context('mode.chained_assignment', None):
+            chunk[datetime_column] = pd.to_datetime(chunk[datetime_column])
+        # the last rows of the previous chunks are aggregated with the rows of the chunk
+        chunk = pd.concat([last_rows, chunk[groupby_columns + [datetime_column]]], ignore_index=True) if len(last_rows) > 0 else chunk
+        if groupby_columns:
+            last_rows = chunk.groupby(groupby_columns)[datetime_column].max().reset_index()
+        else:
+            last_rows = pd.DataFrame({datetime_column: [chunk[datetime_column].max()]})
+    return last_rows
+
+
+def drop_rows_until(df, df_last_rows, datetime_column, groupby_columns):
+    """
+    Drop the rows that are not more recent than the last timestamp of their time series in another dataframe, e.g. the rows already processed.
+    """
+    if len(df_last_rows) == 0:
+        return df
+    if groupby_columns:
+        last_times = df_last_rows.groupby(groupby_columns)[datetime_column].max()
+        last_times = pd.Series(last_times.reindex(df.set_index(groupby_columns).index).array, index=df.index)
+    else:
+        last_times = df_last_rows[datetime_column].max()
+    # the rows of new time series are compared to null timestamps, which is always false
+    return df[~(df[datetime_column] <= last_times)]
 
 
 def generic_check_compute_arguments(datetime_column, groupby_columns):
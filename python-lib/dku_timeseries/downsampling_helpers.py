@@ -0,0 +1,153 @@
+# coding: utf-8
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+from dku_timeseries.dataframe_helpers import group_columns_by_observation_pattern
+from dku_timeseries.timeseries_helpers import FREQUENCY_STRINGS, ROUND_COMPATIBLE_TIME_UNIT, timestamps_to_int64
+
+OHLC_AGGREGATIONS = [('open', 'first'), ('high', 'max'), ('low', 'min'), ('close', 'last')]
+
+# frequencies whose time steps are labelled by the day that ends them, as in pandas resample
+END_ANCHORED_FREQUENCIES = ['M', 'A', 'Q', 'BM', 'BA', 'BQ', 'W']
+
+
+def is_end_anchored(frequency):
+    """
+    Whether the time steps of a frequency are labelled by their last day, e.g. month ends for "M" or Sundays for "W-SUN".
+    """
+    return to_offset(frequency).rule_code.split('-')[0] in END_ANCHORED_FREQUENCIES
+
+
+def get_buckets_range(start_time, end_time, frequency, time_unit):
+    """
+    Return the times between which the reference time index is generated, so that the first and last rows belong to its first and last time steps.
+    The time steps of calendar frequencies are labelled by days: end anchored time steps end with the day of their label, so the first label
+    is the first one from the day of start_time, and the other time steps start at their label, so the first label is the last one until
+    this day. In both cases, the last label is found from the day of end_time.
+    """
+    if time_unit in ROUND_COMPATIBLE_TIME_UNIT:
+        # the time index rounds the times to the time unit, which would add an empty time step after a last row in the second half of a unit
+        unit_frequency = FREQUENCY_STRINGS[time_unit]
+        return start_time.floor(unit_frequency), end_time.floor(unit_frequency)
+    start_day, end_day = start_time.floor('D'), end_time.floor('D')
+    if is_end_anchored(frequency):
+        return start_day, end_day
+    return to_offset(frequency).rollback(start_day), end_day
+
+
+def get_bucket_ids(timestamps, time_index, frequency, tick_step=None):
+    """
+    Compute the number of the time step of each timestamp, between the bucket bounds of get_bucket_bounds.
+    When tick_step is given, time_index is the regular range time_index[0] + k * tick_step and the numbers are found with integer division.
+    The timestamps outside of the time index get -1 before its first time step, and len(time_index) after the end of its last time step.
+    """
+    time_index_length = len(time_index)
+    if time_index_length == 0:
+        return np.full(len(timestamps), -1, dtype='int64')
+    if tick_step is not None:
+        bucket_ids = (timestamps_to_int64(timestamps) - timestamps_to_int64(time_index[:1])[0]) // tick_step
+        return np.clip(bucket_ids, -1, time_index_length)
+    return np.searchsorted(get_bucket_bounds(time_index, frequency), timestamps_to_int64(timestamps), side='right') - 1
+
+
+def get_bucket_bounds(time_index, frequency):
+    """
+    Return the int64 timestamps of the start of each time step of a non-empty time index, followed by the end of its last time step.
+    A time step is from a value of the time index (included) to the next one (excluded), except for end anchored frequencies where, as in
+    pandas resample, it is right closed and ends with the whole day of its value, e.g. the month ending with this day.
+    """
+    offset = to_offset(frequency)
+    if is_end_anchored(frequency):
+        bounds = pd.DatetimeIndex([time_index[0] - offset]).append(time_index) + pd.DateOffset(days=1)
+    else:
+        bounds = time_index.append(pd.DatetimeIndex([time_index[-1] + offset]))
+    return timestamps_to_int64(bounds)
+
+
+def get_bucket_starts(bucket_ids):
+    """
+    Return the positions where each bucket starts in an array of sorted bucket numbers, and the number of each of these buckets.
+    """
+    is_bucket_start = np.ones(len(bucket_ids), dtype=bool)
+    is_bucket_start[1:] = bucket_ids[1:] != bucket_ids[:-1]
+    bucket_starts = np.flatnonzero(is_bucket_start)
+    return bucket_starts, bucket_ids[bucket_starts]
+
+
+def get_observed_positions(is_observed, bucket_starts, last=False):
+    """
+    Compute the position of the first (or last) observed row of each bucket and each column, -1 when a bucket has no observed row.
+    """
+    rows_number = len(is_observed)
+    positions = np.arange(rows_number)[:, np.newaxis]
+    if last:
+        return np.maximum.reduceat(np.where(is_observed, positions, -1), bucket_starts, axis=0)
+    observed_positions = np.minimum.reduceat(np.where(is_observed, positions, rows_number), bucket_starts, axis=0)
+    observed_positions[observed_positions == rows_number] = -1
+    return observed_positions
+
+
+def aggregate_buckets(values, bucket_starts, aggregation):
+    """
+    Aggregate the rows of a 2-D float array by buckets of consecutive rows starting at bucket_starts, ignoring the null values.
+    Empty aggregates are null, except for count.
+    """
+    if len(bucket_starts) == 0:
+        return np.empty((0, values.shape[1]), dtype='int64' if aggregation == 'count' else float)
+    is_observed = ~np.isnan(values)
+    if aggregation == 'count':
+        return np.add.reduceat(is_observed, bucket_starts, axis=0, dtype='int64')
+    if aggregation == 'mean':
+        sums = np.add.reduceat(np.where(is_observed, values, 0), bucket_starts, axis=0)
+        counts = np.add.reduceat(is_observed, bucket_starts, axis=0, dtype='int64')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+    if aggregation == 'min':
+        # fmin and fmax ignore the null values, unless all the values are null
+        return np.fmin.reduceat(values, bucket_starts, axis=0)
+    if aggregation == 'max':
+        return np.fmax.reduceat(values, bucket_starts, axis=0)
+    if aggregation in ['first', 'last']:
+        observed_positions = get_observed_positions(is_observed, bucket_starts, last=(aggregation == 'last'))
+        aggregated = np.take_along_axis(values, np.maximum(observed_positions, 0), axis=0)
+        aggregated[observed_positions < 0] = np.nan
+        return aggregated
+    raise ValueError('Aggregation "{}" is not valid.'.format(aggregation))
+
+
+def average_over_buckets(times, values, bucket_bounds):
+    """
+    Compute the time-weighted mean of each column of a 2-D float array over the buckets between consecutive bucket bounds, from the area under
+    the piecewise linear curve through the non-null values of the column: the trapezoidal areas are accumulated once at the int64 times of
+    the rows, and the area of a bucket is the difference of the accumulated areas at its bounds, in O(rows + buckets).
+    The mean is taken over the part of each bucket between the first and the last non-null values. A bucket that only contains the last
+    non-null value gets this value, and the buckets out of the range of the non-null values are null.
+    """
+    averages = np.full((len(bucket_bounds) - 1, values.shape[1]), np.nan)
+    for column_positions, observed_rows in group_columns_by_observation_pattern(~np.isnan(values)):
+        if len(observed_rows) == 0:
+            continue
+        # durations in nanoseconds from the first non-null value, as floats for the areas
+        observed_times = (times[observed_rows] - times[observed_rows[0]]).astype(float)
+        observed_values = values[np.ix_(observed_rows, column_positions)]
+        bounds = np.clip(bucket_bounds - times[observed_rows[0]], 0, observed_times[-1]).astype(float)
+        covered_durations = np.diff(bounds)
+        if len(observed_rows) > 1:
+            durations = np.diff(observed_times)
+            accumulated_areas = np.zeros_like(observed_values)
+            np.cumsum((observed_values[1:] + observed_values[:-1]) / 2 * durations[:, np.newaxis], axis=0, out=accumulated_areas[1:])
+            # accumulated area at each bound, from the last observed time before it and the linear interpolation of the values at the bound
+            segments = np.clip(np.searchsorted(observed_times, bounds, side='right') - 1, 0, len(observed_rows) - 2)
+            elapsed = (bounds - observed_times[segments])[:, np.newaxis]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                # rows with the same timestamp are a vertical step of the curve
+                slopes = np.where(durations[segments, np.newaxis] > 0,
+                                  (observed_values[segments + 1] - observed_values[segments]) / durations[segments, np.newaxis], 0)
+                bound_areas = accumulated_areas[segments] + observed_values[segments] * elapsed + slopes * elapsed ** 2 / 2
+                averages[:, column_positions] = np.diff(bound_areas, axis=0) / covered_durations[:, np.newaxis]
+        # the buckets that only cover a single instant of the curve, the last observed time
+        last_time = times[observed_rows[-1]]
+        is_last_bucket = (covered_durations == 0) & (bucket_bounds[:-1] <= last_time) & (last_time < bucket_bounds[1:])
+        averages[np.ix_(is_last_bucket, column_positions)] = observed_values[-1]
+    return averages
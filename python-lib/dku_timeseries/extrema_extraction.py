@@ -3,7 +3,7 @@ import logging
 
 import pandas as pd
 
-from dku_timeseries.dataframe_helpers import has_duplicates, nothing_to_do, generic_check_compute_arguments
+from dku_timeseries.dataframe_helpers import has_duplicates, nothing_to_do, generic_check_compute_arguments, sort_by_time_index
 from dku_timeseries.timeseries_helpers import get_date_offset, format_group_id
 
 logger = logging.getLogger(__name__)
@@ -98,7 +98,7 @@ class ExtremaExtractor:
         if has_duplicates(df, datetime_column):
             raise ValueError('The time series {} contain duplicate timestamps.'.format(df_id))
 
-        df = df.set_index(datetime_column).sort_index()
+        df = sort_by_time_index(df.set_index(datetime_column))
 
         extrema_value = df[extrema_column].agg(self.params.extrema_type)
         extrema = df[df[extrema_column] == extrema_value]
@@ -6,7 +6,7 @@ from operator import itemgetter
 import numpy as np
 import pandas as pd
 
-from dku_timeseries.dataframe_helpers import has_duplicates, nothing_to_do, generic_check_compute_arguments
+from dku_timeseries.dataframe_helpers import has_duplicates, nothing_to_do, generic_check_compute_arguments, sort_by_time_index
 
 logger = logging.getLogger(__name__)
 
@@ -164,7 +164,7 @@ class IntervalRestrictor:
 
         df_copy = df.copy()
         df_copy.loc[:, datetime_column] = pd.to_datetime(df_copy[datetime_column])
-        df_copy = df_copy.set_index(datetime_column).sort_index()
+        df_copy = sort_by_time_index(df_copy.set_index(datetime_column))
 
         segment_indexes = self._detect_time_segment(df_copy, filter_column, filter_function)
 
@@ -180,7 +180,7 @@ class IntervalRestrictor:
             for k, v in mask_dict.items():
                 df_labeled.loc[v, 'interval_id'] = str(int(k))
 
-            segment_df = df_labeled.loc[np.logical_or.reduce(list(mask_dict.values()))].sort_index()
+            segment_df = sort_by_time_index(df_labeled.loc[np.logical_or.reduce(list(mask_dict.values()))])
         else:
             segment_df = pd.DataFrame(columns=df_copy.columns)
 
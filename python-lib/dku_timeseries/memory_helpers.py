@@ -0,0 +1,64 @@
+# coding: utf-8
+import logging
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    # the resource module is only available on Unix systems
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# peak memory of the process at the previous log of log_stage_memory, with and without the child processes
+_previous_peak_memories = {}
+
+
+def get_peak_memory_mb(include_children=False):
+    """
+    Peak resident memory of the current process since it started, in megabytes, or None if it can not be measured on this system.
+    With include_children, the peak memory of the largest terminated child process is added, e.g. for a process pool.
+    """
+    if resource is None:
+        return None
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if include_children:
+        peak_memory += resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak_memory / (1024.0 * 1024.0)
+    return peak_memory / 1024.0
+
+
+def get_current_memory_mb():
+    """
+    Current resident memory of the current process in megabytes, or None if it can not be measured on this system (it is read from /proc on Linux).
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024.0 * 1024.0)
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def log_stage_memory(stage, include_children=False):
+    """
+    Log the resident memory after a stage, and how much the peak memory of the process grew during the stage, i.e. since the previous log.
+    The peak memory covers the whole life of the process, so a stage that uses less memory than a previous one does not make it grow.
+    """
+    peak_memory = get_peak_memory_mb(include_children=include_children)
+    if peak_memory is None:
+        return
+    previous_peak_memory = _previous_peak_memories.get(include_children)
+    _previous_peak_memories[include_children] = peak_memory
+    if previous_peak_memory is None:
+        peak_growth = 'peak memory of {:.1f} MB since the start of the process'.format(peak_memory)
+    else:
+        peak_growth = 'peak memory grown by {:.1f} MB during this stage, to {:.1f} MB'.format(peak_memory - previous_peak_memory, peak_memory)
+    current_memory = get_current_memory_mb()
+    if current_memory is None:
+        logger.info('Memory after {}: {}'.format(stage, peak_growth))
+    else:
+        logger.info('Memory after {}: {:.1f} MB resident, {}'.format(stage, current_memory, peak_growth))
@@ -1,19 +1,39 @@
 # -*- coding: utf-8 -*-
+import copy
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 import numpy as np
 from scipy import interpolate
 
-from dku_timeseries.dataframe_helpers import has_duplicates, nothing_to_do, filter_empty_columns, generic_check_compute_arguments
-from dku_timeseries.timeseries_helpers import FREQUENCY_STRINGS, generate_date_range, reformat_time_value, format_resampling_step, reformat_time_step, format_group_id
+from dku_timeseries.dataframe_helpers import has_duplicates, is_sorted_by_time, sort_by_time, nothing_to_do, filter_empty_columns, generic_check_compute_arguments, \
+    group_columns_by_observation_pattern, sort_by_segments, split_segments_in_batches, forward_fill_codes, backward_fill_codes, round_to_integers, \
+    is_resampleable_dtype, is_masked_dtype, get_float_values, to_masked_array, drop_rows_until
+from dku_timeseries.downsampling_helpers import OHLC_AGGREGATIONS, aggregate_buckets, get_bucket_ids, get_bucket_starts, get_buckets_range, \
+    get_observed_positions, get_bucket_bounds, average_over_buckets, is_end_anchored
+from dku_timeseries.memory_helpers import log_stage_memory
+from dku_timeseries.timeseries_helpers import FREQUENCY_STRINGS, generate_date_range, get_date_range_bounds, reformat_time_value, format_resampling_step, \
+    reformat_time_step, \
+    get_tick_step, get_union_positions, find_positions, timestamps_to_int64, int64_to_timestamps, estimate_date_range_length, get_average_step_duration
 
 logger = logging.getLogger(__name__)
 
-INTERPOLATION_METHODS = ['linear', 'nearest', 'slinear', 'zero', 'quadratic', 'cubic', 'previous', 'next', 'constant', 'none']
+INTERPOLATION_METHODS = ['linear', 'time', 'nearest', 'slinear', 'zero', 'quadratic', 'cubic', 'previous', 'next', 'constant', 'none']
 EXTRAPOLATION_METHODS = ['none', 'clip', 'interpolation', 'no_extrapolation']
 CATEGORY_IMPUTATION_METHODS = ['empty', 'constant', 'previous', 'next', 'clip', 'mode']
+DOWNSAMPLING_METHODS = ['interpolation', 'mean', 'time_weighted_mean', 'min', 'max', 'first', 'last', 'count', 'ohlc']
+PRECISIONS = ['float64', 'float32']
+# order of the B-splines fitted on all the columns of a block at once
+SPLINE_ORDERS = {'quadratic': 2, 'cubic': 3}
+# methods evaluated by searching the positions among the observed positions, with no interpolation function
+STEP_METHODS = ['previous', 'next', 'nearest', 'zero']
 TIME_UNITS = list(FREQUENCY_STRINGS.keys()) + ['rows']
+# column of the output of a multi-rate resampling that holds the time step of each row
+TIME_STEP_COLUMN = 'time_step'
+# each process receives several batches of time series, so that a batch of long series does not leave the other processes idle
+BATCHES_PER_JOB = 4
 
 
 class ResamplerParams:
@@ -31,14 +51,24 @@ class ResamplerParams:
                  clip_end=0,
                  shift=0,
                  custom_start_date=None,
-                 custom_end_date=None):
+                 custom_end_date=None,
+                 n_jobs=1,
+                 downsampling_method='interpolation',
+                 precision='float64',
+                 integer_columns=None,
+                 per_series_time_index=False,
+                 max_output_memory_mb=None):
 
         self.interpolation_method = interpolation_method
         self.extrapolation_method = extrapolation_method
         self.constant_value = constant_value
         self.category_imputation_method = category_imputation_method
         self.category_constant_value = category_constant_value
-        self.time_step = reformat_time_step(time_step, time_unit)
+        # a list of time steps resamples the time series at each of them, in a single pass
+        self.time_steps = list(time_step) if isinstance(time_step, (list, tuple)) else [time_step]
+        if len(self.time_steps) == 0:
+            raise ValueError('Invalid time step, it must be a number greater than 0')
+        self.time_step = reformat_time_step(self.time_steps[0], time_unit)
         self.time_unit = time_unit
         self.resampling_step = format_resampling_step(time_unit, self.time_step, time_unit_end_of_week)
         self.time_unit_end_of_week = time_unit_end_of_week
@@ -47,6 +77,15 @@ class ResamplerParams:
         self.shift = reformat_time_value(float(shift), time_unit)
         self.custom_start_date = custom_start_date
         self.custom_end_date = custom_end_date
+        self.n_jobs = n_jobs
+        self.downsampling_method = downsampling_method
+        self.precision = precision
+        # numerical columns whose resampled values are rounded, e.g. the integer columns of a DSS schema
+        self.integer_columns = integer_columns or []
+        # resample each time series on the part of the time index common to all of them that covers its own first and last timestamps
+        self.per_series_time_index = per_series_time_index
+        # resampling fails before building the time indexes when the estimated memory of the output exceeds this budget, None for no budget
+        self.max_output_memory_mb = max_output_memory_mb
 
     def check(self):
 
@@ -56,8 +95,10 @@ class ResamplerParams:
         if self.extrapolation_method not in EXTRAPOLATION_METHODS:
             raise ValueError(
                 'Method "{0}" is not valid. Possible extrapolation methods are: {1}.'.format(self.extrapolation_method, EXTRAPOLATION_METHODS))
-        if self.time_step <= 0:
+        if any(reformat_time_step(time_step, self.time_unit) <= 0 for time_step in self.time_steps):
             raise ValueError('Time step can not be null or negative.')
+        if len(set(self.time_steps)) < len(self.time_steps):
+            raise ValueError('The time steps must be different. Got: {}'.format(self.time_steps))
         if self.category_imputation_method not in CATEGORY_IMPUTATION_METHODS:
             raise ValueError(
                 '"{0}" is not valid way to impute category values. Possible methods are: {1}.'.format(self.category_imputation_method,
@@ -67,10 +108,36 @@ class ResamplerParams:
                 '"{0}" is not a valid unit. Possible time units are: {1}'.format(self.time_unit, TIME_UNITS))
         if self.time_unit == 'rows':
             raise NotImplementedError
+        if not isinstance(self.n_jobs, int) or (self.n_jobs < 1 and self.n_jobs != -1):
+            raise ValueError('Number of processes must be a positive integer, or -1 to use all the available cores. Got: {}'.format(self.n_jobs))
+        if self.downsampling_method not in DOWNSAMPLING_METHODS:
+            raise ValueError(
+                'Method "{0}" is not valid. Possible downsampling methods are: {1}.'.format(self.downsampling_method, DOWNSAMPLING_METHODS))
+        if self.precision not in PRECISIONS:
+            raise ValueError('Precision "{0}" is not valid. Possible precisions are: {1}.'.format(self.precision, PRECISIONS))
+        if self.max_output_memory_mb is not None and not self.max_output_memory_mb > 0:
+            raise ValueError('The output memory budget must be a positive number of MB. Got: {}'.format(self.max_output_memory_mb))
+
+    def get_time_step_params(self):
+        """
+        Return a copy of these parameters for each time step of a multi-rate resampling.
+        """
+        time_step_params = []
+        for time_step in self.time_steps:
+            params = copy.copy(self)
+            params.time_steps = [time_step]
+            params.time_step = reformat_time_step(time_step, self.time_unit)
+            params.resampling_step = format_resampling_step(self.time_unit, params.time_step, self.time_unit_end_of_week)
+            time_step_params.append(params)
+        return time_step_params
+
+    def get_n_jobs(self):
+        if self.n_jobs == -1:
+            return os.cpu_count() or 1
+        return self.n_jobs
 
 
 class Resampler:
-    RESAMPLEABLE_TYPES = [int, float, np.float32, np.int32]
 
     def __init__(self, params=None):
 
@@ -78,64 +145,606 @@ class Resampler:
             raise ValueError('ResamplerParams not specified.')
         self.params = params
         self.params.check()
+        # a multi-rate resampling is done by one resampler per time step
+        if len(params.time_steps) > 1:
+            self._time_step_resamplers = [Resampler(time_step_params) for time_step_params in params.get_time_step_params()]
+        else:
+            self._time_step_resamplers = [self]
 
     def transform(self, df, datetime_column, groupby_columns=None):    
         if groupby_columns is None:
             groupby_columns = []
 
         generic_check_compute_arguments(datetime_column, groupby_columns)
-        df_copy = df.copy()
+        self._check_time_step_column(df.columns)
 
-        # drop all rows where the timestamp is null
-        df_copy = df_copy.dropna(subset=[datetime_column])
+        # drop all rows where the timestamp is null, dropna returns a new dataframe so the input is never modified
+        df_copy = df.dropna(subset=[datetime_column])
         if nothing_to_do(df_copy, min_len=2):
             logger.warning('The timeseries has less than 2 rows with values, can not resample.')
             return df_copy
 
-        df_copy.loc[:, datetime_column] = pd.to_datetime(df_copy[datetime_column])
+        # df_copy is a new dataframe, not a view of the input
+        with pd.option_context('mode.chained_assignment', None):
+            df_copy[datetime_column] = pd.to_datetime(df_copy[datetime_column])
+        log_stage_memory('input preparation')
+        start_time, end_time = df_copy[datetime_column].min(), df_copy[datetime_column].max()
+        columns_to_resample, category_columns = self._get_columns_to_resample(df_copy, datetime_column, groupby_columns)
+        # the size of the output is known from the time ranges, so an output too large for the memory fails before being allocated
+        output_rows_number = self._estimate_output_rows_number(df_copy, datetime_column, groupby_columns, start_time, end_time)
+        self._check_output_memory(output_rows_number, groupby_columns, columns_to_resample, category_columns)
         # when having multiple timeseries, their time range is not necessarily the same
-        # we thus compute a unified time index for all partitions
-        reference_time_index = self._compute_full_time_index(df_copy, datetime_column)
-        columns_to_resample = [col for col in df_copy.select_dtypes(Resampler.RESAMPLEABLE_TYPES).columns.tolist() if col != datetime_column and col not in groupby_columns]
-        category_columns = [col for col in df.select_dtypes(exclude=Resampler.RESAMPLEABLE_TYPES).columns.tolist() if col != datetime_column and col not in columns_to_resample and
-                            col not in groupby_columns]
+        # we thus compute a unified time index for all partitions, of which each time series may only use the part covering its own time range
+        reference_time_indexes = self._compute_reference_time_indexes(start_time, end_time)
+        df_resampled = self._transform_on_time_indexes(df_copy, datetime_column, groupby_columns, columns_to_resample, category_columns,
+                                                       reference_time_indexes)
+        log_stage_memory('resampling')
+        df_resampled = df_resampled[self._get_output_columns(df.columns, columns_to_resample)].reset_index(drop=True)
+        log_stage_memory('output assembly')
+
+        return df_resampled
+
+    def transform_arrays(self, timestamps, values):
+        """
+        Resample a single time series given as arrays, without the dataframe operations of `transform`, whose overhead dominates on small
+        time series such as the ones of online scoring requests.
+        The resampled values are the ones of `transform` on a dataframe with one numerical column per column of `values`, as floats.
+        :param timestamps: array of datetimes, or pd.DatetimeIndex to resample the time series in its timezone
+        :param values: 1-D array of values, or 2-D array with one row per timestamp and one column per numerical column
+        :return: the reference timestamps as a pd.DatetimeIndex, and the resampled values with the same number of dimensions as `values`
+        """
+        if self.params.downsampling_method != 'interpolation':
+            raise ValueError('Only the interpolation downsampling method is available to resample arrays.')
+        if len(self.params.time_steps) > 1:
+            raise ValueError('Only one time step is available to resample arrays.')
+        timestamps = pd.DatetimeIndex(timestamps)
+        values = np.asarray(values, dtype=self.params.precision)
+        is_one_column = values.ndim == 1
+        if is_one_column:
+            values = values[:, np.newaxis]
+        if len(timestamps) != len(values):
+            raise ValueError('The timestamps and the values must have the same length. Got: {} and {}'.format(len(timestamps), len(values)))
+
+        is_timestamp = ~timestamps.isna()
+        if not is_timestamp.all():
+            timestamps, values = timestamps[is_timestamp], values[is_timestamp]
+        if len(timestamps) >= 2:
+            if not is_sorted_by_time(timestamps):
+                order = np.argsort(timestamps.asi8, kind='mergesort')
+                timestamps, values = timestamps[order], values[order]
+            if np.any(timestamps.asi8[1:] == timestamps.asi8[:-1]):
+                raise ValueError('The time series contain duplicate timestamps.')
+            reference_time_index = self._compute_full_time_index(timestamps[0], timestamps[-1])
+            if np.count_nonzero(~np.isnan(values), axis=0).max(initial=0) < 2:
+                logger.warning('All numerical columns are empty for the time series.')
+                values = np.full((len(reference_time_index), values.shape[1]), np.nan, dtype=self.params.precision)
+            else:
+                if self.params.extrapolation_method == 'no_extrapolation':
+                    reference_time_index = reference_time_index[reference_time_index.searchsorted(timestamps[0]):
+                                                                reference_time_index.searchsorted(timestamps[-1], side='right')]
+                values, is_extrapolated, _, _, _ = self._resample_values(timestamps, values, reference_time_index)
+                if self.params.extrapolation_method == 'no_extrapolation':
+                    reference_time_index, values = reference_time_index[~is_extrapolated], values[~is_extrapolated]
+            timestamps = reference_time_index
+        else:
+            logger.warning('The timeseries has less than 2 rows with values, can not resample.')
+        return timestamps, values[:, 0] if is_one_column else values
+
+    def _resample_values(self, timestamps, raw_values, reference_time_index):
+        """
+        Resample the columns of a 2-D float array, whose rows are the sorted timestamps of a time series, as `_resample` does with the
+        numerical columns of a dataframe: the columns with less than 2 values are not interpolated, and keep their values on the reference
+        timestamps that are in the time series.
+        Returns the same arrays as `_interpolate_values`.
+        """
+        is_interpolated = np.count_nonzero(~np.isnan(raw_values), axis=0) > 1
+        interpolated_values, is_extrapolated, raw_positions, reference_positions, union_length = self._interpolate_values(
+            timestamps, raw_values[:, is_interpolated], reference_time_index)
+        values = np.full((len(reference_time_index), raw_values.shape[1]), np.nan, dtype=self.params.precision)
+        values[:, is_interpolated] = interpolated_values
+        observed_indices = find_positions(raw_positions, reference_positions)
+        is_observed = observed_indices >= 0
+        values[np.ix_(is_observed, ~is_interpolated)] = raw_values[np.ix_(observed_indices[is_observed], ~is_interpolated)]
+        return values, is_extrapolated, raw_positions, reference_positions, union_length
+
+    def transform_chunks(self, chunks, datetime_column, start_time, end_time, groupby_columns=None):
+        """
+        Resample a dataset read in chunks, yielding each time series as soon as it is complete.
+        The chunks must be sorted by time series identifiers: a time series is complete once the following one has started.
+        start_time and end_time are the first and last timestamps of the whole dataset, used to compute the same unified time index as `transform`.
+        """
+        if groupby_columns is None:
+            groupby_columns = []
+
+        generic_check_compute_arguments(datetime_column, groupby_columns)
+        columns = None
+        columns_to_resample, category_columns = None, None
+        # rows of the last time series read so far, kept until its last row has been read
+        pending_chunks = []
+        pending_group_id = None
+        flushed_group_ids = set()
+        for chunk in chunks:
+            chunk = chunk.dropna(subset=[datetime_column] + groupby_columns)
+            with pd.option_context('mode.chained_assignment', None):
+                chunk[datetime_column] = pd.to_datetime(chunk[datetime_column])
+            if columns is None:
+                columns = chunk.columns
+                self._check_time_step_column(columns)
+                columns_to_resample, category_columns = self._get_columns_to_resample(chunk, datetime_column, groupby_columns)
+                # the time series are resampled a few at a time, so the budget applies to the output of a single time series
+                output_rows_number = sum(resampler._estimate_time_index_length(pd.Timestamp(start_time), pd.Timestamp(end_time))
+                                         for resampler in self._time_step_resamplers)
+                self._check_output_memory(output_rows_number, groupby_columns, columns_to_resample, category_columns)
+                reference_time_indexes = self._compute_reference_time_indexes(pd.Timestamp(start_time), pd.Timestamp(end_time))
+            if not groupby_columns or len(chunk) == 0:
+                pending_chunks.append(chunk)
+                continue
+
+            last_group_id = chunk[groupby_columns].iloc[-1]
+            is_last_group = (chunk[groupby_columns] == last_group_id).all(axis=1).values
+            if np.all(is_last_group) and tuple(last_group_id) == pending_group_id:
+                pending_chunks.append(chunk)
+                continue
+            complete_df = pd.concat(pending_chunks + [chunk[~is_last_group]])
+            pending_chunks = [chunk[is_last_group]]
+            pending_group_id = tuple(last_group_id)
+            if len(complete_df) == 0:
+                continue
+            yield self._transform_complete_groups(complete_df, datetime_column, groupby_columns, columns, columns_to_resample, category_columns,
+                                                  reference_time_indexes, flushed_group_ids)
+
+        if pending_chunks:
+            yield self._transform_complete_groups(pd.concat(pending_chunks), datetime_column, groupby_columns, columns, columns_to_resample,
+                                                  category_columns, reference_time_indexes, flushed_group_ids)
+
+    def _transform_complete_groups(self, df, datetime_column, groupby_columns, columns, columns_to_resample, category_columns, reference_time_indexes,
+                                   flushed_group_ids):
+        if groupby_columns:
+            group_ids = set(df[groupby_columns].drop_duplicates().itertuples(index=False, name=None))
+            if not flushed_group_ids.isdisjoint(group_ids):
+                raise ValueError('The input dataset must be sorted by time series identifiers to be resampled by chunks.')
+            flushed_group_ids.update(group_ids)
+        if len(df) == 0 or (nothing_to_do(df, min_len=2) and not groupby_columns):
+            logger.warning('The timeseries has less than 2 rows with values, can not resample.')
+            return df[columns].reset_index(drop=True)
+        df_resampled = self._transform_on_time_indexes(df, datetime_column, groupby_columns, columns_to_resample, category_columns, reference_time_indexes)
+        return df_resampled[self._get_output_columns(columns, columns_to_resample)].reset_index(drop=True)
+
+    def transform_incremental(self, df, datetime_column, state=None, groupby_columns=None):
+        """
+        Resample the rows appended to a dataset since the previous run, from the state returned by this previous run (None for the first run).
+        Returns the new resampled rows and the state to pass to the next run.
+        Only the rows that later data can not change are returned: for each time series, the reference timestamps up to the last timestamp
+        at which all its numerical columns are observed. The outputs of the successive runs thus add up to the output of `transform` on the
+        whole dataset, without the extrapolated values after the end of each time series.
+        Rows that are not more recent than the last row processed for their time series are ignored.
+        The values extrapolated before the first value of a column are only the same as in `transform` if the column has at least two values
+        in the run where its time series appears.
+        """
+        if groupby_columns is None:
+            groupby_columns = []
+
+        generic_check_compute_arguments(datetime_column, groupby_columns)
+        self._check_incremental_methods()
+
+        df_new = df.dropna(subset=[datetime_column] + groupby_columns)
+        with pd.option_context('mode.chained_assignment', None):
+            df_new[datetime_column] = pd.to_datetime(df_new[datetime_column])
+        if state is None:
+            if len(df_new) == 0:
+                return df_new[df.columns].reset_index(drop=True), None
+            start_time, end_time = df_new[datetime_column].min(), df_new[datetime_column].max()
+            df_all = df_new
+            last_emitted_times = {}
+        else:
+            start_time, end_time = state['start_time'], state['end_time']
+            if len(df_new) > 0:
+                end_time = max(end_time, df_new[datetime_column].max())
+            df_new = drop_rows_until(df_new, state['tail'], datetime_column, groupby_columns)
+            df_all = pd.concat([state['tail'], df_new[state['tail'].columns]], ignore_index=True)
+            last_emitted_times = dict(zip(map(tuple, state['last_emitted'][groupby_columns].values), state['last_emitted'][datetime_column]))
+
+        reference_time_index = self._compute_full_time_index(start_time, end_time)
+        columns_to_resample, category_columns = self._get_columns_to_resample(df_all, datetime_column, groupby_columns)
         if groupby_columns:
-            grouped = df_copy.groupby(groupby_columns)
-            resampled_groups = []
-            identifiers_number = len(groupby_columns)
-            for group_id, group in grouped:
-                logger.info("Computing for group: {}".format(group_id))
-                group_resampled = self._resample(group.drop(groupby_columns, axis=1), datetime_column, columns_to_resample, category_columns,
-                                                 reference_time_index,
-                                                 df_id=group_id)
-                group_id = format_group_id(group_id, identifiers_number)
-                group_resampled[groupby_columns] = pd.DataFrame([group_id], index=group_resampled.index)
-                resampled_groups.append(group_resampled)
-            df_resampled = pd.concat(resampled_groups, sort=True)
+            sorted_positions, segment_starts, segment_ends, segment_codes, identifiers_uniques = sort_by_segments(df_all, groupby_columns,
+                                                                                                                  datetime_column)
+            df_sorted = df_all.iloc[sorted_positions]
+            group_ids = [tuple(uniques[codes[segment_number]] for codes, uniques in zip(segment_codes, identifiers_uniques))
+                         for segment_number in range(len(segment_starts))]
         else:
-            df_resampled = self._resample(df_copy, datetime_column, columns_to_resample, category_columns, reference_time_index)
+            df_sorted = sort_by_time(df_all, datetime_column)
+            segment_starts, segment_ends, group_ids = [0], [len(df_sorted)], [()]
 
-        df_resampled = df_resampled[df.columns].reset_index(drop=True)
+        resampled_groups, tails, last_emitted_rows = [], [], []
+        series_columns = [column for column in df_all.columns if column not in groupby_columns]
+        for segment_start, segment_end, group_id in zip(segment_starts, segment_ends, group_ids):
+            df_series = df_sorted.iloc[segment_start:segment_end]
+            group_resampled, tail_start, last_emitted_time = self._resample_incrementally(df_series[series_columns], datetime_column, columns_to_resample,
+                                                                                    category_columns, reference_time_index,
+                                                                                    last_emitted_times.get(group_id), df_id=group_id)
+            for groupby_column, value in zip(groupby_columns, group_id):
+                group_resampled[groupby_column] = value
+            resampled_groups.append(group_resampled)
+            tails.append(df_series[(df_series[datetime_column] >= tail_start).values])
+            if last_emitted_time is not None:
+                last_emitted_rows.append(group_id + (last_emitted_time,))
 
+        df_resampled = pd.concat(resampled_groups, ignore_index=True)
+        new_state = {
+            'start_time': start_time,
+            'end_time': end_time,
+            'tail': pd.concat(tails, ignore_index=True),
+            'last_emitted': pd.DataFrame(last_emitted_rows, columns=groupby_columns + [datetime_column])
+        }
+        return df_resampled[df.columns], new_state
+
+    def select_new_rows(self, chunks, datetime_column, state=None, groupby_columns=None):
+        """
+        Concatenate the rows of the chunks of a dataset that `transform_incremental` does not ignore with this state: the rows more recent
+        than the last row processed for their time series, e.g. the rows appended since the previous run. Only these rows are kept in
+        memory while the chunks are read, whatever the length of the history of the dataset.
+        chunks must contain at least one dataframe.
+        """
+        if groupby_columns is None:
+            groupby_columns = []
+        new_rows = []
+        for chunk in chunks:
+            if state is not None:
+                chunk = chunk.dropna(subset=[datetime_column] + groupby_columns)
+                with pd.option_context('mode.chained_assignment', None):
+                    chunk[datetime_column] = pd.to_datetime(chunk[datetime_column])
+                chunk = drop_rows_until(chunk, state['tail'], datetime_column, groupby_columns)
+            new_rows.append(chunk)
+        return pd.concat(new_rows, ignore_index=True)
+
+    def _check_incremental_methods(self):
+        if self.params.downsampling_method != 'interpolation':
+            raise ValueError('Incremental resampling is not available with the "{}" downsampling method.'.format(self.params.downsampling_method))
+        if self.params.interpolation_method in ['quadratic', 'cubic']:
+            raise ValueError('Incremental resampling is not available with the "{}" interpolation method, that depends on the whole time series.'.format(
+                self.params.interpolation_method))
+        if self.params.category_imputation_method not in ['empty', 'constant', 'previous']:
+            raise ValueError('Incremental resampling is not available with the "{}" category imputation method, that depends on the following rows.'.format(
+                self.params.category_imputation_method))
+        if self.params.per_series_time_index:
+            raise ValueError('Incremental resampling is not available with a time index per time series.')
+        if len(self.params.time_steps) > 1:
+            raise ValueError('Incremental resampling is not available with several time steps.')
+
+    def _resample_incrementally(self, df, datetime_column, columns_to_resample, category_columns, reference_time_index, last_emitted_time,
+                                df_id=''):
+        """
+        Resample a sorted time series made of the state tail and of its new rows.
+        Returns the new final resampled rows, the first timestamp to keep in the state tail and the last emitted reference timestamp.
+        """
+        timestamps = df[datetime_column]
+        if nothing_to_do(df, min_len=2):
+            return pd.DataFrame(columns=df.columns), timestamps.iloc[0], last_emitted_time
+        if has_duplicates(df, datetime_column):
+            raise ValueError('The time series {} contain duplicate timestamps.'.format(df_id))
+
+        if last_emitted_time is not None:
+            # the interpolation only depends on the positions relative to the observed values, so the reference timestamps
+            # before the tail, that are already emitted, can be left out of the union
+            reference_time_index = reference_time_index[reference_time_index.searchsorted(timestamps.iloc[0]):]
+        df_resampled = self._resample(df, datetime_column, columns_to_resample, category_columns, reference_time_index, df_id=df_id)
+
+        # after the last value of a column, its values are extrapolated and will change with the next values
+        final_time = timestamps.iloc[-1]
+        for column in columns_to_resample:
+            observed_timestamps = timestamps[df[column].notnull()]
+            if len(observed_timestamps) > 0:
+                final_time = min(final_time, observed_timestamps.iloc[-1])
+        if len(reference_time_index) > 0:
+            final_time = min(final_time, reference_time_index[-1])
+        is_final = (df_resampled[datetime_column] <= final_time).values
+        if last_emitted_time is not None:
+            is_final &= (df_resampled[datetime_column] > last_emitted_time).values
+        df_resampled = df_resampled[is_final]
+        if len(df_resampled) > 0:
+            last_emitted_time = df_resampled[datetime_column].iloc[-1]
+
+        # the tail starts at the last value of each column before the final time, so that the next rows are interpolated as in the whole time series
+        tail_start = final_time
+        observed_columns = columns_to_resample + (category_columns if self.params.category_imputation_method != 'empty' else [])
+        for column in observed_columns:
+            observed_timestamps = timestamps[df[column].notnull() & (timestamps <= final_time)]
+            if len(observed_timestamps) > 0:
+                tail_start = min(tail_start, observed_timestamps.iloc[-1])
+        return df_resampled, tail_start, last_emitted_time
+
+    def _get_output_columns(self, columns, columns_to_resample):
+        output_columns = []
+        for column in columns:
+            if column in columns_to_resample and self.params.downsampling_method == 'ohlc':
+                output_columns.extend(['{}_{}'.format(column, name) for name, _ in OHLC_AGGREGATIONS])
+            else:
+                output_columns.append(column)
+        if len(self.params.time_steps) > 1:
+            output_columns.append(TIME_STEP_COLUMN)
+        return output_columns
+
+    def _check_time_step_column(self, columns):
+        if len(self.params.time_steps) > 1 and TIME_STEP_COLUMN in columns:
+            raise ValueError('The input can not have a "{}" column, that holds the time step of each row with several time steps.'.format(TIME_STEP_COLUMN))
+
+    def _get_columns_to_resample(self, df, datetime_column, groupby_columns):
+        columns = [col for col in df.columns if col != datetime_column and col not in groupby_columns]
+        columns_to_resample = [col for col, dtype in zip(columns, df[columns].dtypes) if is_resampleable_dtype(dtype)]
+        category_columns = [col for col in columns if col not in columns_to_resample]
+        return columns_to_resample, category_columns
+
+    def _transform_on_time_indexes(self, df, datetime_column, groupby_columns, columns_to_resample, category_columns, reference_time_indexes):
+        """
+        Resample the time series on the reference time index of each time step.
+        With several time steps, the input is sorted, split in time series and checked for duplicate timestamps once, the sorted time series are
+        resampled at each time step, and the rows resampled at each time step are tagged with this time step.
+        """
+        if len(self._time_step_resamplers) == 1:
+            return self._transform_on_time_index(df, datetime_column, groupby_columns, columns_to_resample, category_columns, reference_time_indexes[0])
+        sorted_segments = self._sort_segments(df, datetime_column, groupby_columns)
+        resampled_dfs = [resampler._transform_sorted_segments(sorted_segments, datetime_column, groupby_columns, columns_to_resample, category_columns,
+                                                              reference_time_index)
+                         for resampler, reference_time_index in zip(self._time_step_resamplers, reference_time_indexes)]
+        df_resampled = pd.concat(resampled_dfs)
+        df_resampled[TIME_STEP_COLUMN] = np.repeat(self.params.time_steps, [len(df_time_step) for df_time_step in resampled_dfs])
+        return df_resampled
+
+    def _transform_on_time_index(self, df, datetime_column, groupby_columns, columns_to_resample, category_columns, reference_time_index):
+        sorted_segments = self._sort_segments(df, datetime_column, groupby_columns)
+        return self._transform_sorted_segments(sorted_segments, datetime_column, groupby_columns, columns_to_resample, category_columns,
+                                               reference_time_index)
+
+    def _sort_segments(self, df, datetime_column, groupby_columns):
+        """
+        Sort the dataframe by (identifiers, time) and find the boundaries of each time series, raising an error when a time series to interpolate
+        has duplicate timestamps.
+        Returns the sorted dataframe without the identifier columns, the start and end positions of each time series in it, the identifiers
+        of each time series, and for each identifier column the code of every time series and the unique values.
+        """
+        if groupby_columns:
+            # sort once by (identifiers, time) and resample each segment of the sorted dataframe, instead of grouping
+            sorted_positions, segment_starts, segment_ends, segment_codes, identifiers_uniques = sort_by_segments(df, groupby_columns, datetime_column)
+            # rows and columns are selected at once, so that the sorted dataframe is the only copy of the input
+            column_positions = [i for i, col in enumerate(df.columns) if col not in groupby_columns]
+            df_sorted = df.iloc[sorted_positions, column_positions]
+            log_stage_memory('sorting by time series identifiers')
+            group_ids = []
+            for segment_number in range(len(segment_starts)):
+                group_id = tuple(uniques[codes[segment_number]] for codes, uniques in zip(segment_codes, identifiers_uniques))
+                group_ids.append(group_id[0] if len(groupby_columns) == 1 else group_id)
+        else:
+            df_sorted = sort_by_time(df, datetime_column)
+            segment_starts, segment_ends, group_ids = np.array([0]), np.array([len(df_sorted)]), ['']
+            segment_codes, identifiers_uniques = [], []
+
+        if self.params.downsampling_method == 'interpolation':
+            timestamps = timestamps_to_int64(df_sorted[datetime_column])
+            # the segments are sorted by time, so the duplicates are equal consecutive timestamps of a segment
+            is_duplicate = timestamps[1:] == timestamps[:-1]
+            is_duplicate[segment_starts[1:] - 1] = False
+            if np.any(is_duplicate):
+                segment_number = np.searchsorted(segment_starts, np.argmax(is_duplicate), side='right') - 1
+                raise ValueError('The time series {} contain duplicate timestamps.'.format(group_ids[segment_number]))
+        return df_sorted, segment_starts, segment_ends, group_ids, segment_codes, identifiers_uniques
+
+    def _transform_sorted_segments(self, sorted_segments, datetime_column, groupby_columns, columns_to_resample, category_columns,
+                                   reference_time_index):
+        """
+        Resample the time series returned by `_sort_segments` on the reference time index, and rebuild their identifier columns.
+        """
+        df_sorted, segment_starts, segment_ends, group_ids, segment_codes, identifiers_uniques = sorted_segments
+        if not groupby_columns:
+            return self._resample(df_sorted, datetime_column, columns_to_resample, category_columns, reference_time_index)
+
+        df_resampled = None
+        if self._has_shared_timestamps(df_sorted[datetime_column], segment_starts, segment_ends):
+            df_resampled = self._resample_matrix(df_sorted, len(segment_starts), datetime_column, columns_to_resample, category_columns,
+                                                 reference_time_index)
+        if df_resampled is not None:
+            resampled_lengths = np.full(len(segment_starts), len(df_resampled) // len(segment_starts))
+        else:
+            resampled_dfs, resampled_lengths = self._resample_segments(df_sorted, segment_starts, segment_ends, group_ids, datetime_column,
+                                                                       columns_to_resample, category_columns, reference_time_index)
+            df_resampled = pd.concat(resampled_dfs, sort=True)
+        # rebuild the identifier columns by repeating the code of each segment
+        for groupby_column, codes, uniques in zip(groupby_columns, segment_codes, identifiers_uniques):
+            df_resampled[groupby_column] = uniques.take(np.repeat(codes, resampled_lengths))
         return df_resampled
 
+    def _has_shared_timestamps(self, timestamps, segment_starts, segment_ends):
+        """
+        Check if the time series of a dataframe sorted by (identifiers, time) all have the same timestamps, e.g. devices reporting on the same
+        clock, and can be resampled together as a single 2-D array.
+        With no extrapolation, each time series keeps its own part of the reference time index, so they are resampled one by one.
+        """
+        if self.params.downsampling_method != 'interpolation' or self.params.extrapolation_method == 'no_extrapolation' or len(segment_starts) < 2:
+            return False
+        series_length = segment_ends[0] - segment_starts[0]
+        if series_length < 2 or np.any(segment_ends - segment_starts != series_length):
+            return False
+        timestamps = timestamps_to_int64(timestamps).reshape(len(segment_starts), series_length)
+        return bool(np.all(timestamps == timestamps[0]))
+
+    def _resample_matrix(self, df_sorted, series_number, datetime_column, columns_to_resample, category_columns, reference_time_index):
+        """
+        Resample time series that have the same timestamps at once: the numerical columns are pivoted into a (time x time series) 2-D array,
+        interpolated with a single interpolation of each pattern of missing values, and melted back to one row per time series and reference
+        timestamp. The values are the ones of resampling each time series on its own.
+        Returns None when a time series has no numerical column to interpolate, for it to be resampled on its own.
+        """
+        series_length = len(df_sorted) // series_number
+        timestamps = df_sorted[datetime_column].iloc[:series_length]
+        columns_number = len(columns_to_resample)
+        # (time series x time) rows and numerical columns, pivoted to time rows and (time series x numerical columns) columns
+        raw_values = get_float_values(df_sorted, columns_to_resample, dtype=self.params.precision)
+        raw_values = raw_values.reshape(series_number, series_length, columns_number).transpose(1, 0, 2).reshape(series_length, -1)
+        has_values = np.count_nonzero(~np.isnan(raw_values), axis=0) > 1
+        if not has_values.reshape(series_number, columns_number).any(axis=1).all():
+            return None
+
+        first_position, last_position = self._get_time_index_positions(reference_time_index, timestamps.iloc[0], timestamps.iloc[-1])
+        reference_time_index = reference_time_index[first_position:last_position]
+        values, _, raw_positions, reference_positions, union_length = self._resample_values(timestamps, raw_values, reference_time_index)
+        reference_length = len(reference_time_index)
+        values = values.reshape(reference_length, series_number, columns_number).transpose(1, 0, 2).reshape(-1, columns_number)
+
+        resampled_columns = {datetime_column: reference_time_index[np.tile(np.arange(reference_length), series_number)]}
+        for i, column in enumerate(columns_to_resample):
+            column_values = np.ascontiguousarray(values[:, i])
+            if is_masked_dtype(df_sorted[column].dtype):
+                column_values = to_masked_array(column_values, df_sorted[column].dtype)
+            elif column in self.params.integer_columns:
+                column_values = round_to_integers(column_values)
+            resampled_columns[column] = column_values
+        # the category columns keep their values on the reference timestamps that are in the time series, or are imputed
+        observed_indices = find_positions(raw_positions, reference_positions)
+        row_positions = np.where(observed_indices >= 0, np.arange(series_number)[:, np.newaxis] * series_length + observed_indices, -1).ravel()
+        for column in category_columns:
+            if self.params.category_imputation_method == 'empty':
+                resampled_columns[column] = pd.api.extensions.take(df_sorted[column].array, row_positions, allow_fill=True)
+            else:
+                resampled_columns[column] = pd.concat([self._impute_category_values(df_sorted[column].iloc[start:start + series_length], raw_positions,
+                                                                                    reference_positions, union_length)
+                                                       for start in range(0, len(df_sorted), series_length)], ignore_index=True)
+        return pd.DataFrame(resampled_columns)
+
+    def _resample_segments(self, df_sorted, segment_starts, segment_ends, group_ids, datetime_column, columns_to_resample, category_columns,
+                           reference_time_index):
+        """
+        Resample the segments of the sorted dataframe, in a pool of processes when n_jobs is greater than 1.
+        Returns the resampled dataframes, with the rows of the segments in the same order as the input segments, and the number of resampled
+        rows of each segment.
+        """
+        n_jobs = self.params.get_n_jobs()
+        if n_jobs == 1 or len(segment_starts) < 2:
+            return self._resample_segments_batch(df_sorted, segment_starts, segment_ends, group_ids, datetime_column, columns_to_resample,
+                                                 category_columns, reference_time_index)
+
+        batches = split_segments_in_batches(segment_starts, segment_ends, n_jobs * BATCHES_PER_JOB)
+        logger.info("Resampling {} time series in {} batches with {} processes".format(len(segment_starts), len(batches), n_jobs))
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = []
+            for first_segment, last_segment in batches:
+                batch_start = segment_starts[first_segment]
+                batch_end = segment_ends[last_segment - 1]
+                futures.append(executor.submit(self._resample_segments_batch,
+                                               df_sorted.iloc[batch_start:batch_end],
+                                               segment_starts[first_segment:last_segment] - batch_start,
+                                               segment_ends[first_segment:last_segment] - batch_start,
+                                               group_ids[first_segment:last_segment],
+                                               datetime_column, columns_to_resample, category_columns, reference_time_index))
+            resampled_dfs, resampled_lengths = [], []
+            for future in futures:
+                batch_dfs, batch_lengths = future.result()
+                resampled_dfs.extend(batch_dfs)
+                resampled_lengths.append(batch_lengths)
+        log_stage_memory('parallel resampling', include_children=True)
+        return resampled_dfs, np.concatenate(resampled_lengths)
+
+    def _resample_segments_batch(self, df_sorted, segment_starts, segment_ends, group_ids, datetime_column, columns_to_resample, category_columns,
+                                 reference_time_index):
+        """
+        Resample consecutive segments of the sorted dataframe over flat arrays, the checks of `_resample` being done for all the segments at once.
+        The duplicate timestamps are already checked by `_sort_segments`.
+        The segments with less than 2 rows, or with no numerical column to interpolate, are resampled on their own by `_resample`.
+        Returns the resampled dataframes, with the rows of the segments in order, and the number of resampled rows of each segment.
+        """
+        logger.info("Resampling {} time series".format(len(segment_starts)))
+        if self.params.downsampling_method != 'interpolation':
+            df_resampled, resampled_lengths = self._aggregate_segments(df_sorted, segment_starts, segment_ends, datetime_column, columns_to_resample,
+                                                                       category_columns, reference_time_index)
+            return [df_resampled], resampled_lengths
+
+        timestamps = timestamps_to_int64(df_sorted[datetime_column])
+        raw_values = get_float_values(df_sorted, columns_to_resample, dtype=self.params.precision)
+        values_counts = np.add.reduceat(~np.isnan(raw_values), segment_starts, axis=0, dtype='int64')
+        is_resampled_alone = (segment_ends - segment_starts < 2) | ~np.any(values_counts > 1, axis=1)
+        resampled_lengths = np.zeros(len(segment_starts), dtype='int64')
+        df_resampled = None
+        if not np.all(is_resampled_alone):
+            df_resampled, resampled_lengths[~is_resampled_alone] = self._interpolate_segments(
+                df_sorted, timestamps, raw_values, segment_starts[~is_resampled_alone], segment_ends[~is_resampled_alone], datetime_column,
+                columns_to_resample, category_columns, reference_time_index)
+        if not np.any(is_resampled_alone):
+            return [df_resampled], resampled_lengths
+
+        # the segments resampled on their own are inserted between the rows of the other segments
+        resampled_rows_before = np.cumsum(resampled_lengths) - resampled_lengths
+        resampled_dfs = []
+        run_start = 0
+        for segment_number in np.flatnonzero(is_resampled_alone):
+            run_end = resampled_rows_before[segment_number]
+            if run_end > run_start:
+                resampled_dfs.append(df_resampled.iloc[run_start:run_end])
+            group_resampled = self._resample(df_sorted.iloc[segment_starts[segment_number]:segment_ends[segment_number]], datetime_column,
+                                             columns_to_resample, category_columns, reference_time_index, df_id=group_ids[segment_number])
+            resampled_dfs.append(group_resampled)
+            resampled_lengths[segment_number] = len(group_resampled)
+            run_start = run_end
+        if df_resampled is not None and run_start < len(df_resampled):
+            resampled_dfs.append(df_resampled.iloc[run_start:])
+        return resampled_dfs, resampled_lengths
+
     def _can_customize_resampling_dates(self):
         return self.params.extrapolation_method == 'clip' or (self.params.extrapolation_method == 'interpolation' and self.params.interpolation_method != 'none')
 
 
-    def _compute_full_time_index(self, df, datetime_column):
+    def _compute_reference_time_indexes(self, start_time, end_time):
+        """
+        Return the reference time index of each time step.
+        """
+        return [resampler._compute_reference_time_index(start_time, end_time) for resampler in self._time_step_resamplers]
+
+    def _compute_reference_time_index(self, start_time, end_time):
+        """
+        Return the time index common to all the time series, of which each time series only uses a part with per_series_time_index.
+        """
+        return self._compute_full_time_index(start_time, end_time)
+
+    def _get_time_index_positions(self, reference_time_index, start_time, end_time):
+        """
+        Return the positions of the first and last (excluded) time steps of the reference time index used by a time series from start_time
+        to end_time: the whole index, or with per_series_time_index the time steps that the time index of the time series alone would cover.
+        These are the time steps from its own clipped and shifted start to its own end, or for downsampling the time steps that contain them,
+        so that all the time series keep the time steps of the reference time index, e.g. 00:00 and 00:30 for a time series starting at 00:20
+        with a step of 30 seconds.
+        """
+        if not self.params.per_series_time_index:
+            return 0, len(reference_time_index)
+        start_time, end_time = self._get_time_index_range(start_time, end_time)
+        start_index, end_index = get_date_range_bounds(start_time, end_time, self.params.clip_start, self.params.clip_end, self.params.shift,
+                                                       self.params.time_step, self.params.time_unit)
+        reference_times = timestamps_to_int64(reference_time_index)
+        if self.params.downsampling_method != 'interpolation' and not is_end_anchored(self.params.resampling_step):
+            # the time step that contains the start, which is labelled by its start
+            first_position = max(np.searchsorted(reference_times, start_index.value, side='right') - 1, 0)
+        else:
+            first_position = np.searchsorted(reference_times, start_index.value, side='left')
+        last_position = np.searchsorted(reference_times, end_index.value, side='right')
+        return first_position, max(first_position, last_position)
+
+    def _compute_full_time_index(self, start_time, end_time):
+        """
+        From the resampling config and the first and last timestamps of the input, create the full index of the output dataframe.
+        """
+        start_time, end_time = self._get_time_index_range(start_time, end_time)
+        return generate_date_range(start_time, end_time, self.params.clip_start, self.params.clip_end, self.params.shift, self.params.resampling_step,
+                                   self.params.time_step, self.params.time_unit)
+
+    def _estimate_time_index_length(self, start_time, end_time):
         """
-        From the resampling config, create the full index of the output dataframe.
+        Compute the length of the full index of the output dataframe without building it, an estimate for calendar frequencies.
         """
-        start_time = df[datetime_column].min()
-        end_time = df[datetime_column].max()
-        clip_start = self.params.clip_start
-        clip_end = self.params.clip_end
-        shift = self.params.shift
-        frequency = self.params.resampling_step
-        time_step = self.params.time_step
-        time_unit = self.params.time_unit
+        start_time, end_time = self._get_time_index_range(start_time, end_time)
+        return estimate_date_range_length(start_time, end_time, self.params.clip_start, self.params.clip_end, self.params.shift,
+                                          self.params.resampling_step, self.params.time_step, self.params.time_unit)
 
+    def _get_time_index_range(self, start_time, end_time):
+        """
+        Extend the time range of the input to the custom dates, and to the time steps of the first and last rows when downsampling.
+        """
         if self._can_customize_resampling_dates():
             custom_start_date = self.params.custom_start_date
             if custom_start_date:
@@ -147,17 +756,54 @@ class Resampler:
                 if custom_end_date > end_time:
                     end_time = custom_end_date
 
-        return generate_date_range(start_time, end_time, clip_start, clip_end, shift, frequency, time_step, time_unit)
+        if self.params.downsampling_method != 'interpolation':
+            # the first and last rows must be in the first and last time steps of the index
+            start_time, end_time = get_buckets_range(start_time, end_time, self.params.resampling_step, self.params.time_unit)
+        return start_time, end_time
 
-    def _resample(self, df, datetime_column, columns_to_resample, category_columns, reference_time_index, df_id=''):
+    def _estimate_output_rows_number(self, df, datetime_column, groupby_columns, start_time, end_time):
         """
-        1. Move datetime column to the index.
-        2. Merge the original datetime index with the full_time_index.
-        3. Create a numerical index of the df and save the correspond index.
+        Estimate the number of rows of the output from the time range of the input, or of each time series when they have their own time
+        index, before any time index is built.
         """
+        if not groupby_columns:
+            return sum(resampler._estimate_time_index_length(start_time, end_time) for resampler in self._time_step_resamplers)
+        if not self.params.per_series_time_index:
+            series_number = df.groupby(groupby_columns, sort=False).ngroups
+            return series_number * sum(resampler._estimate_time_index_length(start_time, end_time) for resampler in self._time_step_resamplers)
+        # one time step per step duration of each time series, leaving out the clipping, shifting and custom dates of their time index
+        time_ranges = df.groupby(groupby_columns, sort=False)[datetime_column].agg(['min', 'max'])
+        durations = timestamps_to_int64(time_ranges['max']) - timestamps_to_int64(time_ranges['min'])
+        rows_number = 0
+        for params in self.params.get_time_step_params():
+            step_duration = get_average_step_duration(params.resampling_step, params.time_step, params.time_unit, tz=start_time.tz)
+            rows_number += int(np.sum(durations // step_duration + 1))
+        return rows_number
 
-        if has_duplicates(df, datetime_column):
-            raise ValueError('The time series {} contain duplicate timestamps.'.format(df_id))
+    def _check_output_memory(self, rows_number, groupby_columns, columns_to_resample, category_columns):
+        """
+        Log the estimated memory of an output of rows_number rows, and raise an error when it exceeds the memory budget.
+        The timestamps, the identifiers and the category columns take 8 bytes per value, the numerical columns the size of the precision.
+        """
+        numerical_columns_number = len(columns_to_resample) * (len(OHLC_AGGREGATIONS) if self.params.downsampling_method == 'ohlc' else 1)
+        other_columns_number = 1 + len(groupby_columns) + len(category_columns) + (1 if len(self.params.time_steps) > 1 else 0)
+        row_size = numerical_columns_number * np.dtype(self.params.precision).itemsize + other_columns_number * 8
+        output_memory_mb = rows_number * row_size / (1024.0 * 1024.0)
+        logger.info('Estimated output: {} rows, {:.1f} MB'.format(rows_number, output_memory_mb))
+        if self.params.max_output_memory_mb is not None and output_memory_mb > self.params.max_output_memory_mb:
+            raise ValueError('The output would have about {} rows and take about {:.0f} MB, more than the memory budget of {} MB. '
+                             'Increase the time step, reduce the time range or increase the budget.'.format(rows_number, output_memory_mb,
+                                                                                                            self.params.max_output_memory_mb))
+
+    def _resample(self, df, datetime_column, columns_to_resample, category_columns, reference_time_index, df_id=''):
+        """
+        1. Sort the time series by time.
+        2. Compute the positions of the original timestamps and of the reference time index in their union.
+        3. Interpolate and extrapolate the numerical columns on these positions, and impute the category columns.
+        The time series must not have duplicate timestamps, that are checked before.
+        """
+        if self.params.downsampling_method != 'interpolation':
+            return self._aggregate(df, datetime_column, columns_to_resample, category_columns, reference_time_index)
 
         if nothing_to_do(df, min_len=2):
             logger.warning('The time series {} has less than 2 rows with values, can not resample.'.format(df_id))
@@ -167,83 +813,330 @@ class Resampler:
         filtered_columns_to_resample = filter_empty_columns(df, columns_to_resample)
         if len(filtered_columns_to_resample) == 0:
             logger.warning('All numerical columns are empty for the time series {}.'.format(df_id))
-            return pd.DataFrame({datetime_column: reference_time_index}, columns=[datetime_column] + columns_to_resample)
+            first_position, last_position = self._get_time_index_positions(reference_time_index, df[datetime_column].min(), df[datetime_column].max())
+            return pd.DataFrame({datetime_column: reference_time_index[first_position:last_position]}, columns=[datetime_column] + columns_to_resample)
 
-        df_resample = df.set_index(datetime_column).sort_index().copy()
-        # merge the reference time index with the original ones that has data
-        # cf: https://stackoverflow.com/questions/47148446/pandas-resample-interpolate-is-producing-nans
-        df_resample = df_resample.reindex(df_resample.index.union(reference_time_index))
-
-        # `scipy.interpolate.interp1d` only works with numerical index, so we create one
-        df_resample['numerical_index'] = range(len(df_resample))
-        reference_index = df_resample.loc[reference_time_index, 'numerical_index']
-        category_imputation_index = pd.Index([])
-
-        df_resample = df_resample.rename_axis(datetime_column).reset_index()
-        for filtered_column in filtered_columns_to_resample:
-
-            df_without_nan = df.dropna(subset=[filtered_column], how='all')
-            interpolation_index_mask = (df_resample[datetime_column] >= df_without_nan[datetime_column].min()) & (
-                    df_resample[datetime_column] <= df_without_nan[datetime_column].max())
-            interpolation_index = df_resample.index[interpolation_index_mask]
-
-            extrapolation_index_mask = (df_resample[datetime_column] < df_without_nan[datetime_column].min()) | (
-                    df_resample[datetime_column] > df_without_nan[datetime_column].max())
-            extrapolation_index = df_resample.index[extrapolation_index_mask]
-
-            index_with_data = df_resample.loc[interpolation_index, filtered_column].dropna(how='all').index
-
-            if self.params.interpolation_method not in ['constant', 'none']:
-                interpolation_function = interpolate.interp1d(index_with_data,
-                                                              df_resample.loc[index_with_data, filtered_column],
-                                                              kind=self.params.interpolation_method,
-                                                              axis=0,
-                                                              fill_value='extrapolate')
-
-                df_resample.loc[interpolation_index, filtered_column] = interpolation_function(df_resample.loc[interpolation_index].index)
-                if self.params.extrapolation_method == "interpolation":
-                    df_resample.loc[extrapolation_index, filtered_column] = interpolation_function(df_resample.loc[extrapolation_index].index)
-            elif self.params.interpolation_method == 'constant':
-                if self.params.extrapolation_method == 'interpolation':
-                    df_resample.loc[:, filtered_column] = df_resample.loc[:, filtered_column].fillna(self.params.constant_value)
-                else:
-                    df_resample.loc[interpolation_index, filtered_column] = df_resample.loc[interpolation_index, filtered_column].fillna(
-                        self.params.constant_value)
-
-            if self.params.extrapolation_method == "clip":
-                temp_df = df_resample.copy().ffill().bfill()
-                df_resample.loc[extrapolation_index, filtered_column] = temp_df.loc[extrapolation_index, filtered_column]
-            elif self.params.extrapolation_method == "no_extrapolation":
-                reference_index = reference_index[~reference_index.isin(extrapolation_index.values)]
-            category_imputation_index = category_imputation_index.union(extrapolation_index).union(interpolation_index)
-
-        if len(category_columns) > 0 and len(category_imputation_index) > 0 and self.params.category_imputation_method != "empty":
-            df_processed = df_resample.loc[category_imputation_index]
-            df_resample.loc[category_imputation_index] = self._fill_in_category_values(df_processed, category_columns)
-        df_resampled = df_resample.loc[reference_index].drop('numerical_index', axis=1)
+        df = sort_by_time(df, datetime_column)
+        df_resampled, _ = self._interpolate_segments(df, timestamps_to_int64(df[datetime_column]),
+                                                     get_float_values(df, columns_to_resample, dtype=self.params.precision), np.array([0]),
+                                                     np.array([len(df)]), datetime_column, columns_to_resample, category_columns, reference_time_index)
         return df_resampled
 
-    def _fill_in_category_values(self, df, category_columns):
-        category_filled_df = df.copy()
-        if self.params.category_imputation_method == "constant":
-            category_filled_df.loc[:, category_columns] = category_filled_df.loc[:, category_columns].fillna(self.params.category_constant_value)
-        elif self.params.category_imputation_method == "previous":
-            category_filled_df.loc[:, category_columns] = category_filled_df.loc[:, category_columns].ffill()
-        elif self.params.category_imputation_method == "next":
-            category_filled_df.loc[:, category_columns] = category_filled_df.loc[:, category_columns].bfill()
-        elif self.params.category_imputation_method == "clip":
-            category_filled_df.loc[:, category_columns] = category_filled_df.loc[:, category_columns].ffill().bfill()
-        elif self.params.category_imputation_method == "mode":
-            # .mode() loses the timezone info for any datetimetz column
-            most_frequent_categoricals = category_filled_df.loc[:, category_columns].mode().iloc[0]
-
-            for col in category_columns:
-                # only perform conversion if the column has a timezone
-                if pd.api.types.is_datetime64_any_dtype(category_filled_df[col]) and category_filled_df[col].dt.tz is not None:
-                    if most_frequent_categoricals[col].tzinfo is None: # tz-naive timestamp -> localize
-                        most_frequent_categoricals[col] = most_frequent_categoricals[col].tz_localize("UTC")
-                    else: # tz_convert
-                        most_frequent_categoricals[col] = most_frequent_categoricals[col].tz_convert("UTC")
-
-            category_filled_df.loc[:, category_columns] = category_filled_df.loc[:, category_columns].fillna(most_frequent_categoricals)
-        return category_filled_df
+    def _interpolate_segments(self, df_sorted, timestamps, raw_values, segment_starts, segment_ends, datetime_column, columns_to_resample,
+                              category_columns, reference_time_index):
+        """
+        Interpolate the numerical columns and impute the category columns of segments of a dataframe sorted by time within each segment, over
+        flat arrays: the int64 timestamps and the float values of the numerical columns of the dataframe are given, the codes of the category
+        columns are computed once, and each segment is resampled on slices of these arrays. The resampled arrays of all the segments are only
+        converted to a dataframe at the end.
+        Each segment must have at least 2 rows, no duplicate timestamps, and a numerical column with at least 2 values. The numerical columns
+        with less than 2 values in a segment keep their values on the reference timestamps that are in the segment.
+        Returns the resampled dataframe and the number of resampled rows of each segment.
+        """
+        tz = df_sorted[datetime_column].dt.tz
+        imputation_method = self.params.category_imputation_method
+        # sorted codes give the smallest of the most frequent values, as DataFrame.mode
+        category_codes = {column: pd.factorize(df_sorted[column], sort=(imputation_method == 'mode'))
+                          for column in category_columns if imputation_method != 'empty'}
+        first_times = int64_to_timestamps(timestamps[segment_starts], tz=tz)
+        last_times = int64_to_timestamps(timestamps[segment_ends - 1], tz=tz)
+        reference_times = timestamps_to_int64(reference_time_index)
+
+        time_index_positions, resampled_values, row_positions = [], [], []
+        reference_codes = {column: [] for column in category_codes}
+        resampled_lengths = np.empty(len(segment_starts), dtype='int64')
+        for segment_number, (segment_start, segment_end) in enumerate(zip(segment_starts, segment_ends)):
+            first_position, last_position = self._get_time_index_positions(reference_time_index, first_times[segment_number], last_times[segment_number])
+            if self.params.extrapolation_method == 'no_extrapolation':
+                # the reference timestamps outside of the time range of this time series would be dropped, so they are left out of the union
+                first_position = max(first_position, np.searchsorted(reference_times, timestamps[segment_start]))
+                last_position = max(first_position, min(last_position, np.searchsorted(reference_times, timestamps[segment_end - 1], side='right')))
+            segment_positions = np.arange(first_position, last_position)
+            values, is_extrapolated, raw_positions, reference_positions, union_length = self._resample_values(
+                timestamps[segment_start:segment_end], raw_values[segment_start:segment_end], reference_time_index[first_position:last_position])
+            if self.params.extrapolation_method == 'no_extrapolation':
+                is_kept = ~is_extrapolated
+                values, reference_positions, segment_positions = values[is_kept], reference_positions[is_kept], segment_positions[is_kept]
+            # the category columns keep their values on the reference timestamps that are in the time series, or are imputed
+            observed_indices = find_positions(raw_positions, reference_positions)
+            row_positions.append(np.where(observed_indices >= 0, segment_start + observed_indices, -1))
+            for column, (codes, _) in category_codes.items():
+                reference_codes[column].append(self._impute_category_codes(codes[segment_start:segment_end], raw_positions, reference_positions,
+                                                                           union_length))
+            time_index_positions.append(segment_positions)
+            resampled_values.append(values)
+            resampled_lengths[segment_number] = len(reference_positions)
+
+        values = np.concatenate(resampled_values)
+        resampled_columns = {datetime_column: reference_time_index[np.concatenate(time_index_positions)]}
+        for i, column in enumerate(columns_to_resample):
+            column_values = np.ascontiguousarray(values[:, i])
+            if is_masked_dtype(df_sorted[column].dtype):
+                # the pandas nullable columns keep their dtype, with the missing values masked instead of an object column
+                column_values = to_masked_array(column_values, df_sorted[column].dtype)
+            elif column in self.params.integer_columns:
+                column_values = round_to_integers(column_values)
+            resampled_columns[column] = column_values
+        row_positions = np.concatenate(row_positions)
+        for column in category_columns:
+            if column in category_codes:
+                resampled_columns[column] = self._decode_category_codes(category_codes[column][1], np.concatenate(reference_codes[column])).array
+            else:
+                resampled_columns[column] = pd.api.extensions.take(df_sorted[column].array, row_positions, allow_fill=True)
+        # the columns are ordered in the dictionary: with a columns argument, pandas converts the timestamps to Python objects
+        df_resampled = pd.DataFrame({column: resampled_columns[column] for column in df_sorted.columns if column in resampled_columns})
+        return df_resampled, resampled_lengths
+
+    def _interpolate_values(self, timestamps, raw_values, reference_time_index):
+        """
+        Interpolate and extrapolate the columns of a 2-D float array, whose rows are the sorted timestamps of a time series, on the reference
+        time index.
+        Returns the interpolated values, whether each reference timestamp is outside of the observed values of a column, the positions of the
+        timestamps and of the reference time index in their union, and the length of this union.
+        """
+        # instead of building the union of the original timestamps and of the reference time index,
+        # we compute the position of each of them in this union, which is all the interpolation needs
+        # cf: https://stackoverflow.com/questions/47148446/pandas-resample-interpolate-is-producing-nans
+        # for fixed frequencies, the timestamps are mapped to the time steps with integer arithmetic
+        tick_step = get_tick_step(self.params.resampling_step, tz=reference_time_index.tz)
+        raw_positions, reference_positions, union_length = get_union_positions(timestamps, reference_time_index, tick_step=tick_step)
+        is_extrapolated = np.zeros(len(reference_positions), dtype=bool)
+        # column-major, so that each resampled column is a contiguous array
+        values = np.empty((len(reference_positions), raw_values.shape[1]), dtype=self.params.precision, order='F')
+
+        if self.params.interpolation_method == 'time':
+            # float offsets in nanoseconds from the start of the time series: exact up to 2**53 ns (about 104 days), with a relative rounding
+            # of ~1e-16 beyond, negligible for the interpolation
+            raw_times = timestamps_to_int64(timestamps)
+            reference_times = (timestamps_to_int64(reference_time_index) - raw_times[0]).astype(float)
+            raw_times = (raw_times - raw_times[0]).astype(float)
+        for column_positions, observed_rows in group_columns_by_observation_pattern(~np.isnan(raw_values)):
+            observed_positions = raw_positions[observed_rows]
+            observed_values = raw_values[np.ix_(observed_rows, column_positions)]
+            if self.params.interpolation_method == 'time':
+                values[:, column_positions] = self._interpolate_on_time(raw_times[observed_rows], observed_values, reference_times)
+            else:
+                values[:, column_positions] = self._interpolate_block(observed_positions, observed_values, reference_positions)
+            is_extrapolated |= (reference_positions < observed_positions[0]) | (reference_positions > observed_positions[-1])
+        return values, is_extrapolated, raw_positions, reference_positions, union_length
+
+    def _aggregate(self, df, datetime_column, columns_to_resample, category_columns, reference_time_index):
+        """
+        Downsample a time series, as a single segment of `_aggregate_segments`.
+        """
+        df = sort_by_time(df, datetime_column)
+        return self._aggregate_segments(df, np.array([0]), np.array([len(df)]), datetime_column, columns_to_resample, category_columns,
+                                        reference_time_index)[0]
+
+    def _aggregate_segments(self, df_sorted, segment_starts, segment_ends, datetime_column, columns_to_resample, category_columns,
+                            reference_time_index):
+        """
+        Downsample the segments of a dataframe sorted by time within each segment, by aggregating their rows by time step, from a timestamp of
+        the reference time index to the next one, or up to the end of the day of a timestamp for end anchored frequencies (weeks, months,
+        quarters and years), as pandas resample does.
+        The rows are assigned to their time step with integer arithmetic, the time steps of all the segments being numbered in order, so that
+        each aggregate is computed for all the time steps of all the segments at once.
+        The time-weighted mean is the area under the linear interpolation of each column over the time step, divided by its duration.
+        Category columns keep their first value of each time step with the "first" method, are counted with "count", and keep their last
+        value otherwise.
+        Returns the downsampled dataframe and the number of time steps of each segment.
+        """
+        method = self.params.downsampling_method
+        step = self.params.resampling_step
+        tz = df_sorted[datetime_column].dt.tz
+        timestamps = timestamps_to_int64(df_sorted[datetime_column])
+        values = get_float_values(df_sorted, columns_to_resample, dtype=self.params.precision)
+        first_times = int64_to_timestamps(timestamps[segment_starts], tz=tz)
+        last_times = int64_to_timestamps(timestamps[segment_ends - 1], tz=tz)
+        time_index_length = len(reference_time_index)
+        if time_index_length > 0:
+            # the time steps of the rows are found at once on the time index common to all the segments, of which each segment uses a part
+            bucket_ids = get_bucket_ids(timestamps, reference_time_index, step, tick_step=get_tick_step(step, tz=reference_time_index.tz))
+            bucket_bounds = get_bucket_bounds(reference_time_index, step)
+        else:
+            bucket_ids = np.full(len(df_sorted), -1, dtype='int64')
+
+        time_index_positions, time_weighted_means = [], []
+        resampled_lengths = np.empty(len(segment_starts), dtype='int64')
+        resampled_length = 0
+        for segment_number, (segment_start, segment_end) in enumerate(zip(segment_starts, segment_ends)):
+            first_position, last_position = self._get_time_index_positions(reference_time_index, first_times[segment_number], last_times[segment_number])
+            time_index_positions.append(np.arange(first_position, last_position))
+            resampled_lengths[segment_number] = last_position - first_position
+            segment_bucket_ids = bucket_ids[segment_start:segment_end]
+            if method == 'time_weighted_mean' and last_position > first_position:
+                # the curve between two rows can span time steps with no rows and the ones out of the time index, so all the rows are used
+                time_weighted_means.append(average_over_buckets(timestamps[segment_start:segment_end], values[segment_start:segment_end],
+                                                                bucket_bounds[first_position:last_position + 1]))
+            # the time steps of all the segments are numbered in order, the rows out of the time steps of their segment get -1
+            is_in_time_index = (segment_bucket_ids >= first_position) & (segment_bucket_ids < last_position)
+            bucket_ids[segment_start:segment_end] = np.where(is_in_time_index, segment_bucket_ids - first_position + resampled_length, -1)
+            resampled_length += last_position - first_position
+
+        is_in_time_index = bucket_ids >= 0
+        bucket_starts, bucket_numbers = get_bucket_starts(bucket_ids[is_in_time_index])
+        values = values[is_in_time_index]
+
+        df_aggregated = pd.DataFrame({datetime_column: reference_time_index[np.concatenate(time_index_positions)]})
+        aggregations = OHLC_AGGREGATIONS if method == 'ohlc' else [(None, method)]
+        for name, aggregation in aggregations:
+            if aggregation == 'time_weighted_mean':
+                aggregated = np.concatenate(time_weighted_means) if time_weighted_means else np.empty((0, len(columns_to_resample)))
+                aggregated = aggregated.astype(self.params.precision, copy=False)
+            else:
+                aggregated = np.full((resampled_length, len(columns_to_resample)), 0 if aggregation == 'count' else np.nan,
+                                     dtype='int64' if aggregation == 'count' else self.params.precision)
+                aggregated[bucket_numbers] = aggregate_buckets(values, bucket_starts, aggregation)
+            for i, column in enumerate(columns_to_resample):
+                column_values = aggregated[:, i]
+                if aggregation in ['first', 'last', 'min', 'max'] and is_masked_dtype(df_sorted[column].dtype):
+                    # these aggregates are values of the column, so the pandas nullable columns keep their dtype
+                    column_values = to_masked_array(column_values, df_sorted[column].dtype)
+                df_aggregated[column if name is None else '{}_{}'.format(column, name)] = column_values
+
+        if len(category_columns) > 0:
+            df_categories = df_sorted[category_columns][is_in_time_index]
+            is_observed = df_categories.notnull().to_numpy()
+            if method == 'count':
+                counts = np.zeros((resampled_length, len(category_columns)), dtype='int64')
+                if len(bucket_starts) > 0:
+                    counts[bucket_numbers] = np.add.reduceat(is_observed, bucket_starts, axis=0, dtype='int64')
+                for i, column in enumerate(category_columns):
+                    df_aggregated[column] = counts[:, i]
+            else:
+                positions = np.full((resampled_length, len(category_columns)), -1)
+                if len(bucket_starts) > 0:
+                    positions[bucket_numbers] = get_observed_positions(is_observed, bucket_starts, last=(method != 'first'))
+                for i, column in enumerate(category_columns):
+                    df_aggregated[column] = pd.api.extensions.take(df_categories[column].array, positions[:, i], allow_fill=True)
+        return df_aggregated, resampled_lengths
+
+    def _interpolate_block(self, observed_positions, observed_values, reference_positions):
+        """
+        Interpolate and extrapolate a 2-D block of observed values (one column per time series column) that share the same observed positions.
+        The interpolation function is built from the observed values only, and only evaluated on the positions of the reference time index
+        in the union of the timestamps: the other positions of the union do not change the resampled values.
+        """
+        first_position, last_position = observed_positions[0], observed_positions[-1]
+        is_inside = (reference_positions >= first_position) & (reference_positions <= last_position)
+        values = np.full((len(reference_positions), observed_values.shape[1]), np.nan, dtype=self.params.precision)
+
+        if self.params.interpolation_method not in ['constant', 'none']:
+            interpolation_function = self._get_interpolation_function(observed_positions, observed_values)
+            if self.params.extrapolation_method == "interpolation":
+                values[:] = interpolation_function(reference_positions)
+            else:
+                values[is_inside] = interpolation_function(reference_positions[is_inside])
+        else:
+            # the reference timestamps that are observed timestamps keep their values
+            observed_indices = find_positions(observed_positions, reference_positions)
+            is_observed = observed_indices >= 0
+            values[is_observed] = observed_values[observed_indices[is_observed]]
+            if self.params.interpolation_method == 'constant':
+                is_filled = ~is_observed if self.params.extrapolation_method == 'interpolation' else ~is_observed & is_inside
+                values[is_filled] = self.params.constant_value
+
+        if self.params.extrapolation_method == "clip":
+            values[reference_positions < first_position] = observed_values[0]
+            values[reference_positions > last_position] = observed_values[-1]
+        return values
+
+    def _interpolate_on_time(self, observed_times, observed_values, times):
+        """
+        Interpolate linearly a 2-D block of observed values with respect to the elapsed time, on the reference times only.
+        Unlike the other methods, that interpolate on the positions in the union of the timestamps, irregular time steps are weighted
+        by their duration.
+        """
+        extrapolation_method = self.params.extrapolation_method
+        # np.interp repeats the first and last values outside of the observed range, which is the clip extrapolation
+        fill_value = None if extrapolation_method in ['clip', 'interpolation'] else np.nan
+        values = np.empty((len(times), observed_values.shape[1]), dtype=self.params.precision)
+        for i in range(observed_values.shape[1]):
+            values[:, i] = np.interp(times, observed_times, observed_values[:, i], left=fill_value, right=fill_value)
+        if extrapolation_method == 'interpolation':
+            # the first and last segments are extended outside of the observed range
+            for is_outside, (start, end) in [(times < observed_times[0], (0, 1)), (times > observed_times[-1], (-2, -1))]:
+                slopes = (observed_values[end] - observed_values[start]) / (observed_times[end] - observed_times[start])
+                values[is_outside] = observed_values[start] + (times[is_outside, np.newaxis] - observed_times[start]) * slopes
+        return values
+
+    def _get_interpolation_function(self, observed_positions, observed_values):
+        """
+        Return a function of the positions in the union that interpolates and extrapolates the 2-D block of observed values.
+        """
+        if self.params.interpolation_method in SPLINE_ORDERS:
+            return self._fit_spline(observed_positions, observed_values)
+        if self.params.interpolation_method in STEP_METHODS:
+            return lambda positions: self._interpolate_steps(observed_positions, observed_values, positions)
+        return interpolate.interp1d(observed_positions, observed_values, kind=self.params.interpolation_method, axis=0, fill_value='extrapolate')
+
+    def _interpolate_steps(self, observed_positions, observed_values, positions):
+        """
+        Evaluate a step method with a single search of the positions among the increasing observed positions, followed by a gather of the
+        observed values of all the columns at once.
+        The values are the ones of `interp1d` with fill_value='extrapolate' in recent scipy versions: previous is null before the first
+        observation, next is null after the last one, nearest and zero repeat the first and last values. Older scipy versions, such as the
+        1.2 of the Python 3.7 code env, repeated the first and last values for previous and next too.
+        """
+        method = self.params.interpolation_method
+        if method == 'nearest':
+            # a position halfway between two observations takes the value of the first one
+            half_positions = observed_positions / 2.0
+            indices = np.searchsorted(half_positions[1:] + half_positions[:-1], positions, side='left')
+        elif method == 'next':
+            indices = np.searchsorted(observed_positions, positions, side='left')
+        else:
+            indices = np.searchsorted(observed_positions, positions, side='right') - 1
+        last_index = len(observed_positions) - 1
+        interpolated_values = observed_values[np.clip(indices, 0, last_index)]
+        if method == 'previous':
+            interpolated_values[indices < 0] = np.nan
+        elif method == 'next':
+            interpolated_values[indices > last_index] = np.nan
+        return interpolated_values
+
+    def _fit_spline(self, observed_positions, observed_values):
+        """
+        Fit one interpolating B-spline on the 2-D block of observed values: the knots and the collocation matrix only depend on the
+        observed positions, so they are built once and the system is solved for all the columns together.
+        This is the spline that `interp1d` fits for the quadratic and cubic methods, without sorting and copying the positions, which are
+        already increasing.
+        """
+        order = SPLINE_ORDERS[self.params.interpolation_method]
+        if len(observed_positions) < order + 1:
+            raise ValueError('x and y arrays must have at least {} entries'.format(order + 1))
+        return interpolate.make_interp_spline(observed_positions, observed_values, k=order, axis=0, check_finite=False)
+
+    def _impute_category_values(self, values, raw_positions, reference_positions, union_length):
+        """
+        Impute a category column on the union of the timestamps, using the integer codes of its values instead of the values themselves.
+        The values are only decoded on the reference positions.
+        """
+        # sorted codes give the smallest of the most frequent values, as DataFrame.mode
+        codes, uniques = pd.factorize(values, sort=(self.params.category_imputation_method == 'mode'))
+        return self._decode_category_codes(uniques, self._impute_category_codes(codes, raw_positions, reference_positions, union_length))
+
+    def _impute_category_codes(self, codes, raw_positions, reference_positions, union_length):
+        """
+        Impute the integer codes of the values of a category column on the union of the timestamps, and return the codes on the reference positions.
+        """
+        method = self.params.category_imputation_method
+        union_codes = np.full(union_length, -1, dtype=codes.dtype)
+        union_codes[raw_positions] = codes
+        if method in ['previous', 'clip']:
+            union_codes = forward_fill_codes(union_codes)
+        if method in ['next', 'clip']:
+            union_codes = backward_fill_codes(union_codes)
+        reference_codes = union_codes[reference_positions]
+        if method == 'mode':
+            # np.unique sorts the codes, so that argmax gives the smallest of the most frequent codes
+            observed_codes, counts = np.unique(codes[codes >= 0], return_counts=True)
+            if len(observed_codes) > 0:
+                reference_codes = np.where(reference_codes >= 0, reference_codes, observed_codes[np.argmax(counts)])
+        return reference_codes
+
+    def _decode_category_codes(self, uniques, codes):
+        imputed_values = pd.Series(pd.api.extensions.take(uniques.array, codes, allow_fill=True))
+        if self.params.category_imputation_method == 'constant':
+            imputed_values = imputed_values.fillna(self.params.category_constant_value)
+        return imputed_values
@@ -1,11 +1,14 @@
 # coding: utf-8
+import functools
 import logging
 import math
 
+import numpy as np
 import pandas as pd
 from pandas.tseries.frequencies import to_offset
 from pandas.tseries.offsets import BDay
 from pandas.tseries.offsets import Day
+from pandas.tseries.offsets import Tick
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +29,18 @@ FREQUENCY_STRINGS = {
     'nanoseconds': 'ns'
 }
 
+DAY_NANOSECONDS = 24 * 3600 * 10 ** 9
+# average duration in nanoseconds of the calendar units, the time steps of semi-annual and quarterly frequencies being in months
+AVERAGE_UNIT_DURATIONS = {
+    'years': int(365.2425 * 24 * 3600 * 10 ** 9),
+    'semi_annual': int(30.436875 * 24 * 3600 * 10 ** 9),
+    'quarters': int(30.436875 * 24 * 3600 * 10 ** 9),
+    'months': int(30.436875 * 24 * 3600 * 10 ** 9),
+    'weeks': 7 * 24 * 3600 * 10 ** 9,
+    'days': 24 * 3600 * 10 ** 9,
+    'business_days': 7 * 24 * 3600 * 10 ** 9 // 5
+}
+
 ROUND_COMPATIBLE_TIME_UNIT = ['days', 'hours', 'minutes', 'seconds', 'milliseconds', 'microseconds', 'nanoseconds']
 UNIT_ORDER = ['years', 'months', 'semi_annual', 'quarters', 'weeks', 'days', 'business_days', 'hours', 'minutes', 'seconds', 'milliseconds', 'microseconds',
               'nanoseconds']
@@ -60,7 +75,9 @@ def format_resampling_step(time_unit, time_step, time_unit_end_of_week):
     return str(time_step) + frequency
 
 
+@functools.lru_cache(maxsize=256)
 def get_date_offset(time_unit, offset_value):
+    # the offsets only depend on the parameters and are immutable, so they are built once per process
     if time_unit == "business_days":
         # adding a Bday converts the timestamps into a business day, so BDay(0) + Saturday January 1st =  Monday January 4th
         if offset_value != 0:
@@ -79,7 +96,10 @@ def get_date_offset(time_unit, offset_value):
     return pd.DateOffset(**{formatted_time_unit: offset_value})
 
 
-def generate_date_range(start_time, end_time, clip_start, clip_end, shift, frequency, time_step, time_unit):
+def get_date_range_bounds(start_time, end_time, clip_start, clip_end, shift, time_step, time_unit):
+    """
+    Return the first timestamp of the date range of generate_date_range, and the timestamp that it must not go beyond.
+    """
     clip_start_value = get_date_offset(time_unit, clip_start)
     clip_end_value = get_date_offset(time_unit, clip_end)
     shift_value = get_date_offset(time_unit, shift)
@@ -108,10 +128,195 @@ def generate_date_range(start_time, end_time, clip_start, clip_end, shift, frequ
     
     start_index = start_index + clip_start_value + shift_value
     end_index = end_index - clip_end_value + shift_value
+    return start_index, end_index
+
 
+def generate_date_range(start_time, end_time, clip_start, clip_end, shift, frequency, time_step, time_unit):
+    start_index, end_index = get_date_range_bounds(start_time, end_time, clip_start, clip_end, shift, time_step, time_unit)
+    tick_step = get_tick_step(frequency, tz=start_index.tz)
+    if tick_step is not None:
+        # fixed frequencies (days and smaller units) are computed with integer arithmetic on the timestamps
+        return generate_regular_date_range(start_index, end_index, tick_step)
+    # pandas generates calendar frequencies one offset at a time, while their anchor days are in the calendar table
+    date_range = generate_calendar_date_range(start_index, end_index, frequency)
+    if date_range is not None:
+        return date_range
     return pd.date_range(start=start_index, end=end_index, freq=frequency)
 
 
+def estimate_date_range_length(start_time, end_time, clip_start, clip_end, shift, frequency, time_step, time_unit):
+    """
+    Compute the length of the date range of generate_date_range without building it.
+    The length is exact for fixed frequencies, and estimated from the average duration of a time step for calendar frequencies.
+    """
+    start_index, end_index = get_date_range_bounds(start_time, end_time, clip_start, clip_end, shift, time_step, time_unit)
+    if end_index < start_index:
+        return 0
+    return int((end_index.value - start_index.value) // get_average_step_duration(frequency, time_step, time_unit, tz=start_index.tz)) + 1
+
+
+def get_average_step_duration(frequency, time_step, time_unit, tz=None):
+    """
+    Return the duration of a time step in nanoseconds, or its average duration for calendar frequencies.
+    """
+    tick_step = get_tick_step(frequency, tz=tz)
+    if tick_step is None:
+        return AVERAGE_UNIT_DURATIONS[time_unit] * time_step
+    return tick_step
+
+
+@functools.lru_cache(maxsize=256)
+def get_tick_step(frequency, tz=None):
+    """
+    Return the step of a fixed frequency (days and smaller units) in nanoseconds, or None for calendar frequencies (business days, weeks, months, years).
+    With a timezone, days are calendar days that can last 23 or 25 hours, so they are not a fixed frequency either.
+    """
+    offset = to_offset(frequency)
+    if isinstance(offset, Tick) and not (tz is not None and isinstance(offset, Day)):
+        return int(offset.nanos)
+    return None
+
+
+def generate_regular_date_range(start_index, end_index, step):
+    """
+    Same as pd.date_range(start_index, end_index, freq) for a fixed frequency of step nanoseconds.
+    """
+    if end_index < start_index:
+        periods = 0
+    else:
+        periods = (end_index.value - start_index.value) // step + 1
+    date_range = pd.DatetimeIndex(start_index.value + step * np.arange(periods, dtype='int64'))
+    if start_index.tz is not None:
+        date_range = date_range.tz_localize('UTC').tz_convert(start_index.tz)
+    return date_range
+
+
+def generate_calendar_date_range(start_index, end_index, frequency):
+    """
+    Same as pd.date_range(start_index, end_index, freq) for a calendar frequency, from the anchor days of its calendar table.
+    Returns None when start_index is not at midnight, or when the range is beyond the calendar table, the range being then generated by pandas.
+    """
+    offset = to_offset(frequency)
+    start_days, is_midnight = get_local_days([start_index])
+    if not is_midnight[0] or offset.n < 1:
+        return None
+    calendar_table = get_calendar_table(offset.base.freqstr)
+    if calendar_table is None:
+        return None
+    table_start, anchor_counts, anchor_days = calendar_table
+    end_days, _ = get_local_days([end_index])
+    if min(start_days[0], end_days[0]) <= table_start or max(start_days[0], end_days[0]) >= table_start + len(anchor_counts):
+        return None
+    # the first anchor day from the start day, and the anchor days until the end day included
+    first_anchor = anchor_counts[start_days[0] - table_start - 1]
+    last_anchor = anchor_counts[end_days[0] - table_start] - 1 if end_index >= start_index else first_anchor - 1
+    days = anchor_days[first_anchor:last_anchor + 1:offset.n]
+    date_range = pd.DatetimeIndex(days * DAY_NANOSECONDS)
+    if start_index.tz is not None:
+        # the midnights that do not exist, or that are ambiguous, in the timezone are left to pandas
+        date_range = date_range.tz_localize(start_index.tz, ambiguous='NaT', nonexistent='NaT')
+        if date_range.hasnans:
+            return None
+    return date_range
+
+
+@functools.lru_cache(maxsize=16)
+def get_calendar_table(anchor_frequency):
+    """
+    Build the calendar table of a frequency once per process: for each day of the time range supported by pandas, the number of anchor days of
+    the frequency (e.g. month ends for "M", business days for "B") from the start of this range until this day.
+    The table stops one year before the end of this range, so that rolling its days forward to the next anchor day does not overflow.
+    Returns the number of the day before the first day of the table since the epoch, the table, that starts with this day, and the numbers of
+    the anchor days; or None when the anchor days still overflow.
+    """
+    days = pd.date_range(pd.Timestamp.min.ceil('D'), pd.Timestamp.max.floor('D') - pd.DateOffset(years=1), freq='D')
+    try:
+        # an anchored offset of 0 rolls the days forward to the next anchor day, and keeps the anchor days
+        is_anchor_day = days + to_offset(anchor_frequency) * 0 == days
+    except pd.errors.OutOfBoundsDatetime:
+        return None
+    table_start = days[0].value // DAY_NANOSECONDS - 1
+    anchor_counts = np.zeros(len(days) + 1, dtype='int32')
+    np.cumsum(is_anchor_day, out=anchor_counts[1:])
+    return table_start, anchor_counts, np.flatnonzero(is_anchor_day) + table_start + 1
+
+
+def get_local_days(timestamps):
+    """
+    Return the number of the day of each timestamp since the epoch, in the timezone of the timestamps, and whether it is at midnight.
+    """
+    timestamps = pd.DatetimeIndex(timestamps)
+    if timestamps.tz is not None:
+        timestamps = timestamps.tz_localize(None)
+    local_timestamps = timestamps.asi8
+    return local_timestamps // DAY_NANOSECONDS, local_timestamps % DAY_NANOSECONDS == 0
+
+
+def get_union_positions(timestamps, time_index, tick_step=None):
+    """
+    Compute the positions of the timestamps and of the time index values in their sorted union, without building the union.
+    Both inputs must be sorted and without duplicates.
+    When tick_step is given, time_index is the regular range time_index[0] + k * tick_step and the positions are found with integer slot numbers.
+    Returns the positions of the timestamps, the positions of the time index values and the length of the union.
+    """
+    timestamps = timestamps_to_int64(timestamps)
+    time_index = timestamps_to_int64(time_index)
+    time_index_length = len(time_index)
+    if time_index_length == 0:
+        return np.arange(len(timestamps)), np.array([], dtype='int64'), len(timestamps)
+
+    if tick_step is not None:
+        offsets = timestamps - time_index[0]
+        slots = offsets // tick_step
+        is_off_slot = offsets % tick_step != 0
+        # number of time index values strictly before each timestamp
+        time_index_before = np.clip(slots + is_off_slot, 0, time_index_length)
+        is_shared = ~is_off_slot & (slots >= 0) & (slots < time_index_length)
+        # a timestamp between two slots, or outside of the range, is before the time index values of the following slots
+        following_slots = np.clip(slots[~is_shared] + 1, 0, time_index_length)
+        timestamps_before = np.cumsum(np.bincount(following_slots, minlength=time_index_length + 1))[:time_index_length]
+    else:
+        time_index_before = np.searchsorted(time_index, timestamps, side='left')
+        is_shared = time_index[np.minimum(time_index_before, time_index_length - 1)] == timestamps
+        timestamps_before = np.searchsorted(timestamps, time_index, side='left') - np.searchsorted(timestamps[is_shared], time_index, side='left')
+
+    # the timestamps that are also in the time index are only counted once in the union
+    shared_before = np.cumsum(is_shared) - is_shared
+    timestamps_positions = np.arange(len(timestamps)) + time_index_before - shared_before
+    time_index_positions = np.arange(time_index_length) + timestamps_before
+    union_length = len(timestamps) + time_index_length - int(np.sum(is_shared))
+    return timestamps_positions, time_index_positions, union_length
+
+
+def find_positions(positions, searched_positions):
+    """
+    Return the index of each searched position in an increasing array of positions, or -1 when it is not one of them.
+    """
+    if len(positions) == 0:
+        return np.full(len(searched_positions), -1, dtype='int64')
+    indices = np.minimum(np.searchsorted(positions, searched_positions), len(positions) - 1)
+    return np.where(positions[indices] == searched_positions, indices, -1)
+
+
+def timestamps_to_int64(timestamps):
+    if isinstance(timestamps, pd.DatetimeIndex):
+        return timestamps.asi8
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype == np.int64:
+        # already int64 timestamps, e.g. a slice of the timestamps of several time series
+        return timestamps
+    return np.asarray(pd.DatetimeIndex(timestamps).asi8, dtype='int64')
+
+
+def int64_to_timestamps(timestamps, tz=None):
+    """
+    Convert int64 timestamps, in nanoseconds since the epoch in UTC, to a pd.DatetimeIndex in the timezone tz.
+    """
+    timestamps = pd.DatetimeIndex(np.asarray(timestamps, dtype='int64').view('datetime64[ns]'))
+    if tz is not None:
+        timestamps = timestamps.tz_localize('UTC').tz_convert(tz)
+    return timestamps
+
+
 def get_smaller_unit(window_unit):
     index = UNIT_ORDER.index(window_unit)
     next_index = index + 1
@@ -5,7 +5,7 @@ import sys
 import numpy as np
 import pandas as pd
 
-from dku_timeseries.dataframe_helpers import has_duplicates, nothing_to_do, generic_check_compute_arguments
+from dku_timeseries.dataframe_helpers import has_duplicates, nothing_to_do, generic_check_compute_arguments, sort_by_time_index
 from dku_timeseries.timeseries_helpers import convert_time_freq_to_row_freq, get_smaller_unit, infer_frequency, FREQUENCY_STRINGS, format_group_id, \
     convert_to_rolling_compatible_time_unit
 
@@ -156,7 +156,7 @@ class WindowAggregator:
             logger.error('The time series {} contain duplicate timestamps.'.format(df_id))
             raise ValueError('The time series {} contain duplicate timestamps.'.format(df_id))
 
-        reference_df = df.set_index(datetime_column).sort_index().copy()
+        reference_df = sort_by_time_index(df.set_index(datetime_column))
         new_df = pd.DataFrame(index=reference_df.index)
 
         # compute all stats except mean and sum, the syntax does not change whether or not we have a window type
@@ -193,7 +193,7 @@ class WindowAggregator:
             logger.error('The time series {} contain duplicate timestamps.'.format(df_id))
             raise ValueError('The time series {} contain duplicate timestamps.'.format(df_id))
 
-        reference_df = df.set_index(datetime_column).sort_index().copy()
+        reference_df = sort_by_time_index(df.set_index(datetime_column))
         new_df = pd.DataFrame(index=reference_df.index)
 
         frequency = infer_frequency(reference_df)
@@ -219,10 +219,10 @@ class WindowAggregator:
             new_df[raw_columns] = df_ref[raw_columns]
         if 'min' in self.params.aggregation_types:
             col_names = ['{}_min'.format(col) for col in raw_columns]
-            new_df[col_names] = roller[raw_columns].apply(min, raw=True)
+            new_df[col_names] = roller[raw_columns].min()
         if 'max' in self.params.aggregation_types:
             col_names = ['{}_max'.format(col) for col in raw_columns]
-            new_df[col_names] = roller[raw_columns].apply(max, raw=True)
+            new_df[col_names] = roller[raw_columns].max()
         if 'q25' in self.params.aggregation_types:
             col_names = ['{}_q25'.format(col) for col in raw_columns]
             new_df[col_names] = roller[raw_columns].quantile(0.25, raw=True)
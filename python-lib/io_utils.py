@@ -1,5 +1,6 @@
 # coding: utf-8
 import logging
+import pickle
 
 import dataiku
 from dataiku.customrecipe import get_input_names_for_role, get_output_names_for_role
@@ -20,6 +21,37 @@ def get_input_output():
     return (input_dataset, output_dataset)
 
 
+def get_output_folder(role):
+    """
+    Return the managed folder of an optional output role, or None if the role is not set.
+    """
+    output_folder_names = get_output_names_for_role(role)
+    if len(output_folder_names) == 0:
+        return None
+    return dataiku.Folder(output_folder_names[0])
+
+
+def get_dataset_outside_flow(dataset):
+    """
+    Return a handle on a dataset that can be read even if it is an output of the recipe, e.g. to check the rows written by a previous run.
+    """
+    return dataiku.Dataset(dataset.full_name, ignore_flow=True)
+
+
+def load_state(folder, path):
+    """
+    Load a state saved in a managed folder by `save_state`, or return None if there is no saved state yet.
+    """
+    if '/' + path.lstrip('/') not in folder.list_paths_in_partition():
+        return None
+    with folder.get_download_stream(path) as stream:
+        return pickle.loads(stream.read())
+
+
+def save_state(folder, path, state):
+    folder.upload_data(path, pickle.dumps(state))
+
+
 def set_column_description(output_dataset, column_description_dict, input_dataset):
     """
     Set column descriptions of the output dataset based on a dictionary of column descriptions
@@ -15,7 +15,7 @@ if sys.version_info >= (3, 0):
 logger = SafeLogger("Time series preparation plugin")
 
 
-def get_resampling_params(recipe_config):
+def get_resampling_params(recipe_config, integer_columns=None):
     def _p(param_name, default=None):
         return recipe_config.get(param_name, default)
 
@@ -43,6 +43,12 @@ def get_resampling_params(recipe_config):
     category_imputation_method = _p('category_imputation_method', 'empty')
     category_constant_value = _p('category_constant_value', '')
     time_step = _p('time_step')
+    additional_time_steps = _p('additional_time_steps') or []
+    if additional_time_steps:
+        try:
+            time_step = [time_step] + [float(additional_time_step) for additional_time_step in additional_time_steps]
+        except ValueError:
+            raise ValueError('The additional time steps must be numbers. Got: {}'.format(additional_time_steps))
     time_unit = _p('time_unit')
     time_unit_end_of_week = _p('time_unit_end_of_week')
     clip_start = _p('clip_start')
@@ -52,6 +58,12 @@ def get_resampling_params(recipe_config):
     custom_start_date = date_from_naive_datetime(_p('custom_start_date')) if start_date_mode == 'CUSTOM' else None
     end_date_mode = _p('end_date_mode', 'AUTO')
     custom_end_date = date_from_naive_datetime(_p('custom_end_date')) if end_date_mode == 'CUSTOM' else None
+    n_jobs = int(_p('n_jobs', 1))
+    downsampling_method = _p('downsampling_method', 'interpolation')
+    precision = _p('precision', 'float64')
+    per_series_time_index = _p('per_series_time_index', False)
+    # 0 means no budget
+    max_output_memory_mb = _p('max_output_memory_mb') or None
 
     params = ResamplerParams(interpolation_method=interpolation_method,
                              extrapolation_method=extrapolation_method,
@@ -65,7 +77,13 @@ def get_resampling_params(recipe_config):
                              clip_end=clip_end,
                              shift=shift,
                              custom_start_date=custom_start_date,
-                             custom_end_date=custom_end_date)
+                             custom_end_date=custom_end_date,
+                             n_jobs=n_jobs,
+                             downsampling_method=downsampling_method,
+                             precision=precision,
+                             integer_columns=integer_columns,
+                             per_series_time_index=per_series_time_index,
+                             max_output_memory_mb=max_output_memory_mb)
     params.check()
     return params
 
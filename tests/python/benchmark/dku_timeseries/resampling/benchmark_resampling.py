@@ -0,0 +1,166 @@
+# coding: utf-8
+"""
+Benchmark of the resampling on synthetic long format datasets.
+
+Every combination of interpolation, extrapolation and category imputation methods is run on datasets generated along several axes
+(number of time series, rows per time series, numerical and category columns, irregularity of the timestamps). The wall time, the
+number of input rows resampled per second and the peak memory of each run are written to a JSON file, that can be compared with
+the results of another version of the plugin:
+
+    PYTHONPATH=python-lib python tests/python/benchmark/dku_timeseries/resampling/benchmark_resampling.py --output after.json --baseline before.json
+"""
+import argparse
+import datetime
+import itertools
+import json
+import logging
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from dku_timeseries import Resampler, ResamplerParams
+from dku_timeseries.resampling import INTERPOLATION_METHODS, EXTRAPOLATION_METHODS, CATEGORY_IMPUTATION_METHODS
+
+DATETIME_COLUMN = "date"
+GROUPBY_COLUMN = "series_id"
+
+
+def generate_dataset(series_number, rows_per_series, numerical_columns, category_columns, irregularity, seed=0):
+    """
+    Generate a long format dataset of time series sampled every minute.
+    With an irregularity between 0 and 1, each timestamp is moved by up to this fraction of a minute and this fraction of the rows is dropped.
+    """
+    rng = np.random.default_rng(seed)
+    offsets = np.tile(np.arange(rows_per_series, dtype=float), series_number)
+    offsets += rng.uniform(-irregularity / 2, irregularity / 2, size=len(offsets))
+    series_ids = np.repeat(np.arange(series_number), rows_per_series)
+    is_kept = rng.random(len(offsets)) >= irregularity
+    is_kept[::rows_per_series] = True
+    offsets, series_ids = offsets[is_kept], series_ids[is_kept]
+
+    df = pd.DataFrame({
+        DATETIME_COLUMN: pd.Timestamp("2021-01-01") + pd.to_timedelta(np.round(offsets * 60, 3), unit="s"),
+        GROUPBY_COLUMN: np.char.add("series_", series_ids.astype(str))
+    })
+    for i in range(numerical_columns):
+        values = np.cumsum(rng.normal(size=len(df)))
+        values[rng.random(len(df)) < 0.1] = np.nan
+        df["value_{}".format(i)] = values
+    for i in range(category_columns):
+        categories = np.array(["low", "medium", "high", None], dtype=object)
+        df["category_{}".format(i)] = categories[rng.integers(0, len(categories), size=len(df))]
+    # a shuffled input also measures the sorting by time series identifiers
+    return df.sample(frac=1, random_state=seed).drop_duplicates(subset=[GROUPBY_COLUMN, DATETIME_COLUMN]).reset_index(drop=True)
+
+
+def run_once(df, params):
+    return Resampler(params).transform(df, DATETIME_COLUMN, groupby_columns=[GROUPBY_COLUMN])
+
+
+def measure(df, params, repeats):
+    """
+    Return the best wall time of several runs, the number of output rows and the peak memory allocated during a last traced run.
+    """
+    wall_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output_df = run_once(df, params)
+        wall_times.append(time.perf_counter() - start)
+    # tracing the allocations slows the run down, so the memory is measured apart from the time
+    tracemalloc.start()
+    run_once(df, params)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(wall_times), len(output_df), peak_memory / (1024.0 * 1024.0)
+
+
+def run_benchmark(args):
+    datasets = itertools.product(args.series, args.rows_per_series, args.numerical_columns, args.category_columns, args.irregularity)
+    methods = list(itertools.product(args.interpolation_methods, args.extrapolation_methods, args.category_imputation_methods))
+    results = []
+    for series_number, rows_per_series, numerical_columns, category_columns, irregularity in datasets:
+        dataset = {"series": series_number, "rows_per_series": rows_per_series, "numerical_columns": numerical_columns,
+                   "category_columns": category_columns, "irregularity": irregularity}
+        df = generate_dataset(series_number, rows_per_series, numerical_columns, category_columns, irregularity)
+        for interpolation_method, extrapolation_method, category_imputation_method in methods:
+            methods_description = {"interpolation_method": interpolation_method, "extrapolation_method": extrapolation_method,
+                                   "category_imputation_method": category_imputation_method}
+            params = ResamplerParams(time_step=args.time_step, time_unit="seconds", **methods_description)
+            wall_time, output_rows, peak_memory = measure(df, params, args.repeats)
+            result = dict(dataset, **methods_description)
+            result.update({"input_rows": len(df), "output_rows": output_rows, "wall_time_s": wall_time, "rows_per_second": len(df) / wall_time,
+                           "peak_memory_mb": peak_memory})
+            results.append(result)
+            print("{series} series x {rows_per_series} rows, {interpolation_method}/{extrapolation_method}/{category_imputation_method}: "
+                  "{wall_time_s:.3f} s, {rows_per_second:.0f} rows/s, {peak_memory_mb:.1f} MB".format(**result))
+    return results
+
+
+def get_result_key(result):
+    return tuple(result[key] for key in ["series", "rows_per_series", "numerical_columns", "category_columns", "irregularity",
+                                         "interpolation_method", "extrapolation_method", "category_imputation_method"])
+
+
+def compare_with_baseline(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline_results = {get_result_key(result): result for result in json.load(baseline_file)["results"]}
+    time_ratios, memory_ratios = [], []
+    for result in results:
+        baseline_result = baseline_results.get(get_result_key(result))
+        if baseline_result is None:
+            continue
+        time_ratios.append(baseline_result["wall_time_s"] / result["wall_time_s"])
+        memory_ratios.append(baseline_result["peak_memory_mb"] / max(result["peak_memory_mb"], 1e-6))
+    if len(time_ratios) == 0:
+        print("No run in common with the baseline {}".format(baseline_path))
+        return
+    print("Compared with {} on {} runs: geometric mean speedup x{:.2f} (min x{:.2f}, max x{:.2f}), geometric mean memory reduction x{:.2f}".format(
+        baseline_path, len(time_ratios), np.exp(np.mean(np.log(time_ratios))), np.min(time_ratios), np.max(time_ratios),
+        np.exp(np.mean(np.log(memory_ratios)))))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="resampling_benchmark.json", help="JSON file where the results are written")
+    parser.add_argument("--baseline", help="JSON file of previous results to compare with")
+    parser.add_argument("--series", type=int, nargs="+", default=[1, 100], help="numbers of time series")
+    parser.add_argument("--rows-per-series", type=int, nargs="+", default=[1000, 10000], help="numbers of rows per time series")
+    parser.add_argument("--numerical-columns", type=int, nargs="+", default=[3], help="numbers of numerical columns")
+    parser.add_argument("--category-columns", type=int, nargs="+", default=[0, 2], help="numbers of category columns")
+    parser.add_argument("--irregularity", type=float, nargs="+", default=[0.0, 0.5], help="irregularities of the timestamps, between 0 and 1")
+    parser.add_argument("--interpolation-methods", nargs="+", default=INTERPOLATION_METHODS, choices=INTERPOLATION_METHODS)
+    parser.add_argument("--extrapolation-methods", nargs="+", default=EXTRAPOLATION_METHODS, choices=EXTRAPOLATION_METHODS)
+    parser.add_argument("--category-imputation-methods", nargs="+", default=CATEGORY_IMPUTATION_METHODS, choices=CATEGORY_IMPUTATION_METHODS)
+    parser.add_argument("--time-step", type=float, default=90, help="resampling time step in seconds")
+    parser.add_argument("--repeats", type=int, default=3, help="number of timed runs, the best one is kept")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    # the resampler logs every time series, which would dominate the measures
+    logging.disable(logging.WARNING)
+    results = run_benchmark(args)
+    output = {
+        "metadata": {
+            "date": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "arguments": vars(args)
+        },
+        "results": results
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(output, output_file, indent=2)
+    print("Results written to {}".format(args.output))
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
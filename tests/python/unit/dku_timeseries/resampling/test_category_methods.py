@@ -312,3 +312,15 @@ class TestCategoryMethods:
         resampler_with_impute = Resampler(params_with_impute)
         impute_df = resampler_with_impute.transform(df, "Date")
         assert pd.isnull(impute_df[columns.category].values).all()
+
+    def test_mode_filling_ties(self, df2, config, columns):
+        config["category_imputation_method"] = "mode"
+        config["time_unit"] = "hours"
+        config["time_step"] = 12
+        df2[columns.category] = ["b", "a", None, "b", "a"]
+        params = get_resampling_params(config)
+        resampler = Resampler(params)
+        output_df = resampler.transform(df2, columns.date)
+        # as DataFrame.mode, the smallest of the most frequent values is used
+        assert np.all(output_df[columns.category].isin(["a", "b"]))
+        assert output_df.loc[1, columns.category] == "a"
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dku_timeseries import Resampler
+from dku_timeseries.downsampling_helpers import aggregate_buckets, get_bucket_ids, average_over_buckets
+from recipe_config_loading import get_resampling_params
+
+
+@pytest.fixture
+def datetime_column():
+    return "Date"
+
+
+@pytest.fixture
+def high_frequency_df(datetime_column):
+    time_index = pd.date_range("2021-01-01 00:00:00.5", periods=600, freq="250ms")
+    values = np.sin(np.arange(600) / 10.0)
+    values[50:60] = np.nan
+    categories = np.array(["a", "b", "c"], dtype=object)[np.arange(600) % 3]
+    return pd.DataFrame({datetime_column: time_index, "value": values, "category": categories})
+
+
+@pytest.fixture
+def config(datetime_column):
+    config = {u'clip_end': 0, u'constant_value': 0, u'extrapolation_method': u'clip', u'shift': 0, u'time_unit_end_of_week': u'SUN',
+              u'datetime_column': datetime_column, u'advanced_activated': False, u'time_unit': u'seconds', u'clip_start': 0, u'time_step': 30,
+              u'interpolation_method': u'linear'}
+    return config
+
+
+class TestDownsampling:
+    @pytest.mark.parametrize("method", ["mean", "min", "max", "first", "last", "count"])
+    @pytest.mark.parametrize("time_unit, time_step, rule", [("seconds", 30, "30S"), ("days", 2, "2D"), ("business_days", 1, "B"), ("weeks", 1, "W-SUN"),
+                                                            ("months", 1, "M"), ("quarters", 1, "3M"), ("years", 1, "A")])
+    def test_same_as_pandas_resample(self, high_frequency_df, config, datetime_column, method, time_unit, time_step, rule):
+        if time_unit != "seconds":
+            # the same rows every 37 hours, from a Saturday afternoon to a Wednesday morning, so that period ends have rows at different hours
+            high_frequency_df[datetime_column] = pd.Timestamp("2021-01-02 15:00:00") + pd.to_timedelta(np.arange(600) * 37, unit="h")
+        config["downsampling_method"] = method
+        config["time_unit"] = time_unit
+        config["time_step"] = time_step
+        resampler = Resampler(get_resampling_params(config))
+        output_df = resampler.transform(high_frequency_df, datetime_column)
+        expected = getattr(high_frequency_df.set_index(datetime_column).resample(rule)["value"], method)()
+        np.testing.assert_array_equal(output_df[datetime_column].values, expected.index.values)
+        np.testing.assert_allclose(output_df["value"].values, expected.values)
+
+    def test_ohlc(self, high_frequency_df, config, datetime_column):
+        config["downsampling_method"] = "ohlc"
+        resampler = Resampler(get_resampling_params(config))
+        output_df = resampler.transform(high_frequency_df, datetime_column)
+        assert list(output_df.columns) == [datetime_column, "value_open", "value_high", "value_low", "value_close", "category"]
+        expected = high_frequency_df.set_index(datetime_column).resample("30S")["value"].ohlc()
+        np.testing.assert_allclose(output_df[["value_open", "value_high", "value_low", "value_close"]].values, expected.values)
+        assert np.all(output_df["category"].values == high_frequency_df.set_index(datetime_column).resample("30S")["category"].last().values)
+
+    def test_long_format_empty_time_steps(self, config, datetime_column):
+        config["downsampling_method"] = "count"
+        resampler = Resampler(get_resampling_params(config))
+        df = pd.DataFrame({datetime_column: pd.to_datetime(["2021-01-01 00:00:00", "2021-01-01 00:00:10", "2021-01-01 00:01:40",
+                                                            "2021-01-01 00:00:20", "2021-01-01 00:00:25"]),
+                           "value": [1.0, 2.0, 3.0, np.nan, 5.0],
+                           "id": ["first", "first", "first", "second", "second"]})
+        output_df = resampler.transform(df, datetime_column, groupby_columns=["id"])
+        assert list(output_df["id"].values) == ["first"] * 4 + ["second"] * 4
+        assert list(output_df["value"].values) == [2, 0, 0, 1, 1, 0, 0, 0]
+
+    def test_time_weighted_mean(self, config, datetime_column):
+        # the time-weighted mean of a ramp over a time step is its value at the middle of the time step, whatever the sampling
+        seconds = np.array([0.0, 1.0, 3.5, 4.0, 9.0, 31.0, 65.0, 80.0, 89.0, 90.0])
+        df = pd.DataFrame({datetime_column: pd.Timestamp("2021-01-01") + pd.to_timedelta(seconds, unit="s"), "value": seconds * 2.0,
+                           "category": list("abcdefghij")})
+        config["downsampling_method"] = "time_weighted_mean"
+        output_df = Resampler(get_resampling_params(config)).transform(df, datetime_column)
+        np.testing.assert_allclose(output_df["value"].values, [30.0, 90.0, 150.0, 180.0])
+        assert output_df["category"].tolist() == ["e", "f", "i", "j"]
+
+    def test_bucket_ids(self):
+        time_index = pd.date_range("2021-01-03", periods=3, freq="W-SUN")
+        timestamps = pd.to_datetime(["2021-01-02", "2021-01-03", "2021-01-09", "2021-01-10", "2021-01-23", "2021-01-24"])
+        np.testing.assert_array_equal(get_bucket_ids(timestamps, time_index, "W-SUN"), [0, 0, 1, 1, 3, 3])
+
+    def test_aggregate_buckets(self):
+        values = np.array([[1.0, np.nan], [3.0, np.nan], [np.nan, 2.0], [4.0, 5.0]])
+        bucket_starts = np.array([0, 2])
+        np.testing.assert_array_equal(aggregate_buckets(values, bucket_starts, "mean"), [[2.0, np.nan], [4.0, 3.5]])
+        np.testing.assert_array_equal(aggregate_buckets(values, bucket_starts, "first"), [[1.0, np.nan], [4.0, 2.0]])
+        np.testing.assert_array_equal(aggregate_buckets(values, bucket_starts, "last"), [[3.0, np.nan], [4.0, 5.0]])
+        np.testing.assert_array_equal(aggregate_buckets(values, bucket_starts, "count"), [[2, 0], [1, 2]])
+
+    def test_average_over_buckets(self):
+        times = np.array([0, 2, 3, 7, 10])
+        values = np.array([[0.0, np.nan, np.nan], [2.0, np.nan, np.nan], [np.nan, np.nan, 4.0], [7.0, np.nan, np.nan], [10.0, np.nan, np.nan]])
+        averages = average_over_buckets(times, values, np.array([-5, 0, 5, 10, 15]))
+        # the curve of the first column has an area of 12.5 from 0 to 5 and of 37.5 from 5 to 10
+        np.testing.assert_array_equal(averages[:, 0], [np.nan, 2.5, 7.5, 10.0])
+        np.testing.assert_array_equal(averages[:, 1], [np.nan] * 4)
+        np.testing.assert_array_equal(averages[:, 2], [np.nan, 4.0, np.nan, np.nan])
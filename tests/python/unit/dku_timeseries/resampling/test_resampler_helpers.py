@@ -2,7 +2,10 @@ import numpy as np
 import pandas as pd
 import pytest
 
-from dku_timeseries.timeseries_helpers import generate_date_range, get_date_offset
+from dku_timeseries.dataframe_helpers import forward_fill_codes, backward_fill_codes
+from dku_timeseries.resampling import ResamplerParams
+from dku_timeseries.timeseries_helpers import generate_date_range, get_date_offset, generate_regular_date_range, get_tick_step, get_union_positions, \
+    find_positions, estimate_date_range_length, generate_calendar_date_range
 from recipe_config_loading import get_resampling_params
 
 
@@ -316,3 +319,69 @@ class TestResamplerHelpers:
         date_range = generate_date_range(start_time, end_time, clip_start, clip_end, shift, frequency, time_step, time_unit)
         np.testing.assert_array_equal(date_range, pd.DatetimeIndex(['2019-01-31 00:59:00.000000007',
                                                                     '2019-01-31 00:59:00.000000008']))
+
+    def test_tick_step(self):
+        assert get_tick_step("2S") == 2 * 10 ** 9
+        assert get_tick_step("0.5S") == 5 * 10 ** 8
+        assert get_tick_step("1D") == 24 * 3600 * 10 ** 9
+        assert get_tick_step("1D", tz="CET") is None
+        assert get_tick_step("1H", tz="CET") == 3600 * 10 ** 9
+        assert get_tick_step("2W-SUN") is None
+        assert get_tick_step("1M") is None
+        assert get_tick_step("1B") is None
+
+    def test_estimate_date_range_length(self):
+        start_time = pd.Timestamp('2019-01-03 10:12:00')
+        end_time = pd.Timestamp('2021-07-20 08:00:00')
+        for time_unit, time_step in [('seconds', 7.5), ('hours', 5), ('days', 1), ('business_days', 1), ('weeks', 2), ('months', 1), ('quarters', 3),
+                                     ('years', 1)]:
+            params = ResamplerParams(time_step=time_step, time_unit=time_unit, clip_start=1, shift=1)
+            arguments = (start_time, end_time, params.clip_start, params.clip_end, params.shift, params.resampling_step, params.time_step, time_unit)
+            date_range_length = len(generate_date_range(*arguments))
+            if time_unit in ['seconds', 'hours', 'days']:
+                assert estimate_date_range_length(*arguments) == date_range_length
+            else:
+                assert abs(estimate_date_range_length(*arguments) - date_range_length) <= 1
+        assert estimate_date_range_length(end_time, start_time, 0, 0, 0, '1D', 1, 'days') == 0
+
+    def test_generate_regular_date_range(self):
+        start_time = pd.Timestamp('2021-03-28 01:13:00').tz_localize("CET")
+        end_time = pd.Timestamp('2021-03-28 05:00:00').tz_localize("CET")
+        for frequency in ["1H", "7T", "0.5S"]:
+            date_range = generate_regular_date_range(start_time, end_time, get_tick_step(frequency, tz="CET"))
+            pd.testing.assert_index_equal(date_range, pd.date_range(start_time, end_time, freq=frequency), exact=False)
+        assert len(generate_regular_date_range(end_time, start_time, get_tick_step("1H"))) == 0
+
+    def test_generate_calendar_date_range(self):
+        for frequency in ["B", "3B", "W-SUN", "2W-WED", "M", "2M", "Q-DEC", "6M", "A", "2A"]:
+            for tz in [None, "CET", "America/New_York"]:
+                start_index = pd.Timestamp("2019-12-30", tz=tz)
+                for end_index in [pd.Timestamp("2023-03-31 12:00:00", tz=tz), pd.Timestamp("2020-01-01", tz=tz), pd.Timestamp("2019-12-01", tz=tz)]:
+                    date_range = generate_calendar_date_range(start_index, end_index, frequency)
+                    pd.testing.assert_index_equal(date_range, pd.date_range(start_index, end_index, freq=frequency), check_names=False)
+        # ranges that do not start at midnight are generated by pandas
+        assert generate_calendar_date_range(pd.Timestamp("2020-01-01 12:00:00"), pd.Timestamp("2021-01-01"), "M") is None
+        # and so are the ranges beyond the calendar table, that stops one year before the last timestamp of pandas
+        assert generate_calendar_date_range(pd.Timestamp("2261-06-01"), pd.Timestamp("2262-01-01"), "M") is None
+
+    def test_union_positions(self):
+        time_index = pd.date_range("2021-01-01", periods=6, freq="2S")
+        timestamps = pd.DatetimeIndex(["2020-12-31 23:59:57", "2021-01-01 00:00:00", "2021-01-01 00:00:03", "2021-01-01 00:00:04",
+                                       "2021-01-01 00:00:09", "2021-01-01 00:00:10", "2021-01-01 00:00:12", "2021-01-01 00:00:14"])
+        union = timestamps.union(time_index)
+        for tick_step in [None, get_tick_step("2S")]:
+            timestamps_positions, time_index_positions, union_length = get_union_positions(timestamps, time_index, tick_step=tick_step)
+            assert union_length == len(union)
+            np.testing.assert_array_equal(timestamps_positions, union.get_indexer(timestamps))
+            np.testing.assert_array_equal(time_index_positions, union.get_indexer(time_index))
+
+    def test_find_positions(self):
+        positions = np.array([1, 4, 5, 9])
+        np.testing.assert_array_equal(find_positions(positions, np.array([0, 1, 2, 5, 9, 10])), [-1, 0, -1, 2, 3, -1])
+        np.testing.assert_array_equal(find_positions(np.array([], dtype=int), np.array([0, 1])), [-1, -1])
+
+    def test_fill_codes(self):
+        codes = np.array([-1, 2, -1, -1, 0, -1])
+        np.testing.assert_array_equal(forward_fill_codes(codes), [-1, 2, 2, 2, 0, 0])
+        np.testing.assert_array_equal(backward_fill_codes(codes), [2, 2, 0, 0, 0, -1])
+        np.testing.assert_array_equal(forward_fill_codes(np.array([-1, -1])), [-1, -1])
@@ -4,6 +4,7 @@ import random
 import numpy as np
 import pandas as pd
 import pytest
+from scipy import interpolate
 
 from dku_timeseries.resampling import ResamplerParams, Resampler
 
@@ -407,3 +408,211 @@ class TestResampler:
         assert len(output_df.index) == 14
         assert np.all(np.isnan(output_df.loc[6:8, DATA_COL]))
         assert np.all(np.isnan(output_df.loc[11:13, DATA_COL]))
+
+    def test_columns_with_different_missing_values(self):
+        data = [float(x) for x in range(20)]
+        df = _make_df_with_one_col(data, period=pd.DateOffset(seconds=2))
+        df["same_pattern_col"] = df[DATA_COL] * 2
+        df["other_pattern_col"] = df[DATA_COL] * 3
+        df.loc[[0, 7, 8, 19], "other_pattern_col"] = np.nan
+        for interpolation_method in ["linear", "nearest", "previous", "cubic", "constant", "none"]:
+            for extrapolation_method in ["clip", "interpolation", "none", "no_extrapolation"]:
+                params = ResamplerParams(interpolation_method=interpolation_method, extrapolation_method=extrapolation_method)
+                resampler = Resampler(params)
+                output_df = resampler.transform(df, TIME_COL)
+                for col in [DATA_COL, "same_pattern_col", "other_pattern_col"]:
+                    single_column_output_df = resampler.transform(df[[TIME_COL, col]], TIME_COL)
+                    # with no_extrapolation, the rows outside the range of any column are dropped
+                    merged_df = output_df[[TIME_COL, col]].merge(single_column_output_df, on=TIME_COL, suffixes=("", "_single"))
+                    np.testing.assert_array_equal(merged_df[col].values, merged_df["{}_single".format(col)].values)
+
+    def test_input_not_modified(self):
+        df = _make_df_with_one_col([1.0, np.nan, 3.0, 4.0], period=pd.DateOffset(seconds=2))
+        df["category"] = ["a", None, "b", None]
+        df[TIME_COL] = df[TIME_COL].astype(str)
+        df_before = df.copy()
+        params = ResamplerParams(category_imputation_method="previous")
+        _ = Resampler(params).transform(df, TIME_COL)
+        pd.testing.assert_frame_equal(df, df_before)
+
+    def test_float32_precision(self):
+        data = [math.sin(x / 3.0) * 1000 for x in range(20)]
+        df = _make_df_with_one_col(data, period=pd.DateOffset(seconds=3))
+        df.loc[[4, 5], DATA_COL] = np.nan
+        for interpolation_method in ["linear", "cubic", "previous"]:
+            output_df = Resampler(ResamplerParams(interpolation_method=interpolation_method)).transform(df, TIME_COL)
+            params = ResamplerParams(interpolation_method=interpolation_method, precision="float32")
+            float32_output_df = Resampler(params).transform(df, TIME_COL)
+            assert float32_output_df[DATA_COL].dtype == np.float32
+            np.testing.assert_allclose(float32_output_df[DATA_COL].values, output_df[DATA_COL].values, rtol=1e-5)
+
+    def test_integer_columns(self):
+        df = _make_df_with_one_col([1, 2, 4, 8], period=pd.DateOffset(seconds=2))
+        df["with_missing_values"] = [1.0, np.nan, 4.0, 8.0]
+        params = ResamplerParams(extrapolation_method="none", integer_columns=[DATA_COL, "with_missing_values"])
+        output_df = Resampler(params).transform(df, TIME_COL)
+        assert output_df[DATA_COL].dtype == np.int64
+        np.testing.assert_array_equal(output_df[DATA_COL].values, [1, 2, 2, 3, 4, 6, 8])
+        np.testing.assert_array_equal(output_df["with_missing_values"].values, [1, 2, 2, 3, 4, 6, 8])
+
+    def test_spline_methods(self):
+        data = [math.sin(x / 3.0) for x in range(20)]
+        df = _make_df_with_one_col(data, period=pd.DateOffset(seconds=2))
+        df["other_col"] = df[DATA_COL] ** 2
+        df.loc[[3, 11], "other_col"] = np.nan
+        for interpolation_method in ["quadratic", "cubic"]:
+            params = ResamplerParams(interpolation_method=interpolation_method, extrapolation_method="interpolation")
+            output_df = Resampler(params).transform(df, TIME_COL)
+            for col in [DATA_COL, "other_col"]:
+                observed_df = df[df[col].notnull()]
+                observed_seconds = (observed_df[TIME_COL] - df[TIME_COL].iloc[0]).dt.total_seconds().values
+                output_seconds = (output_df[TIME_COL] - df[TIME_COL].iloc[0]).dt.total_seconds().values
+                expected_values = interpolate.interp1d(observed_seconds, observed_df[col].values, kind=interpolation_method,
+                                                       fill_value="extrapolate")(output_seconds)
+                np.testing.assert_allclose(output_df[col].values, expected_values, atol=1e-9)
+
+    def test_spline_not_enough_values(self):
+        df = _make_df_with_one_col([1.0, 2.0, 4.0], period=pd.DateOffset(seconds=2))
+        with pytest.raises(ValueError):
+            Resampler(ResamplerParams(interpolation_method="cubic")).transform(df, TIME_COL)
+
+    def test_step_methods(self):
+        observed_positions = np.array([1, 3, 6])
+        observed_values = np.array([[10.0, -1.0], [30.0, -3.0], [60.0, -6.0]])
+        positions = np.arange(8)
+        # previous and next are null out of the observations that they need, as with interp1d in recent scipy versions
+        expected_columns = {
+            "previous": [np.nan, 10.0, 10.0, 30.0, 30.0, 30.0, 60.0, 60.0],
+            "next": [10.0, 10.0, 30.0, 30.0, 60.0, 60.0, 60.0, np.nan],
+            "nearest": [10.0, 10.0, 10.0, 30.0, 30.0, 60.0, 60.0, 60.0],
+            "zero": [10.0, 10.0, 10.0, 30.0, 30.0, 30.0, 60.0, 60.0]
+        }
+        for interpolation_method, expected_column in expected_columns.items():
+            resampler = Resampler(ResamplerParams(interpolation_method=interpolation_method))
+            interpolated_values = resampler._interpolate_steps(observed_positions, observed_values, positions)
+            np.testing.assert_array_equal(interpolated_values[:, 0], expected_column)
+            np.testing.assert_array_equal(interpolated_values[:, 1], -np.array(expected_column) / 10.0)
+
+    def test_time_interpolation(self):
+        df = pd.DataFrame({
+            TIME_COL: pd.to_datetime(['2021-01-01 00:00:00', '2021-01-01 00:00:01', '2021-01-01 00:00:05', '2021-01-01 00:00:06']).tz_localize('CET'),
+            DATA_COL: [0.0, 1.0, 5.0, np.nan],
+            "other_col": [np.nan, 2.0, 10.0, 12.0]
+        })
+        params = ResamplerParams(interpolation_method="time", extrapolation_method="none", time_step=2)
+        output_df = Resampler(params).transform(df, TIME_COL)
+        np.testing.assert_array_equal(output_df[DATA_COL].values, [0.0, 2.0, 4.0, np.nan])
+        np.testing.assert_array_equal(output_df["other_col"].values, [np.nan, 4.0, 8.0, 12.0])
+
+        # the values are the ones of pandas time interpolation, while the linear method interpolates on the rows
+        union_index = pd.DatetimeIndex(pd.concat([df[TIME_COL], output_df[TIME_COL]])).drop_duplicates().sort_values()
+        expected_series = df.set_index(TIME_COL)[DATA_COL].reindex(union_index).interpolate(method="time", limit_area="inside")
+        np.testing.assert_array_equal(output_df[DATA_COL].values, expected_series.reindex(output_df[TIME_COL]).values)
+
+        params = ResamplerParams(interpolation_method="time", extrapolation_method="interpolation", time_step=2)
+        output_df = Resampler(params).transform(df, TIME_COL)
+        np.testing.assert_array_equal(output_df[DATA_COL].values, [0.0, 2.0, 4.0, 6.0])
+        np.testing.assert_array_equal(output_df["other_col"].values, [0.0, 4.0, 8.0, 12.0])
+        params = ResamplerParams(interpolation_method="time", extrapolation_method="clip", time_step=2)
+        output_df = Resampler(params).transform(df, TIME_COL)
+        np.testing.assert_array_equal(output_df[DATA_COL].values, [0.0, 2.0, 4.0, 5.0])
+        params = ResamplerParams(interpolation_method="time", extrapolation_method="no_extrapolation", time_step=2)
+        output_df = Resampler(params).transform(df, TIME_COL)
+        np.testing.assert_array_equal(output_df["other_col"].values, [4.0, 8.0])
+
+    @pytest.mark.skipif(not hasattr(pd, "Float32Dtype"), reason="requires the nullable float dtypes of pandas 1.2")
+    def test_nullable_dtypes(self):
+        df = _make_df_with_one_col([1, 2, 4, 8], period=pd.DateOffset(seconds=2))
+        df[DATA_COL] = df[DATA_COL].astype("Int64")
+        df.loc[1, DATA_COL] = pd.NA
+        df["small_int_col"] = pd.array([1, 2, None, 5], dtype="UInt8")
+        df["float_col"] = pd.array([1.0, None, 3.0, 4.0], dtype="Float32")
+        df["bool_col"] = pd.array([True, None, False, False], dtype="boolean")
+        df["numpy_int_col"] = np.array([1, 2, 3, 4], dtype="int16")
+        output_df = Resampler(ResamplerParams(extrapolation_method="none")).transform(df, TIME_COL)
+        assert output_df[DATA_COL].dtype == "Int64"
+        np.testing.assert_array_equal(output_df[DATA_COL].to_numpy(), [1, 2, 2, 3, 4, 6, 8])
+        assert output_df["small_int_col"].dtype == "UInt8"
+        np.testing.assert_array_equal(output_df["small_int_col"].to_numpy(), [1, 2, 2, 3, 4, 4, 5])
+        assert output_df["float_col"].dtype == "Float32"
+        np.testing.assert_array_equal(output_df["float_col"].to_numpy(dtype=float), [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0])
+        assert output_df["bool_col"].dtype == "boolean"
+        np.testing.assert_array_equal(output_df["bool_col"].to_numpy(), [True, True, False, False, False, False, False])
+        np.testing.assert_array_equal(output_df["numpy_int_col"].values, [1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0])
+
+        # the null values are masked instead of converting the column to objects
+        output_df = Resampler(ResamplerParams(extrapolation_method="none")).transform(df.iloc[1:], TIME_COL)
+        assert output_df[DATA_COL].dtype == "Int64"
+        assert output_df[DATA_COL].isna().tolist() == [True, True, False, False, False]
+
+    def test_several_time_steps(self, long_format_df):
+        params = ResamplerParams(time_step=[1, 2], time_unit="days")
+        output_df = Resampler(params).transform(long_format_df, TIME_COL, groupby_columns=[GROUP_COL])
+        assert output_df.columns.tolist() == long_format_df.columns.tolist() + ["time_step"]
+        # the rows of each time step are the output of a resampling at this time step only
+        for time_step in [1, 2]:
+            expected_df = Resampler(ResamplerParams(time_step=time_step, time_unit="days")).transform(long_format_df, TIME_COL, groupby_columns=[GROUP_COL])
+            time_step_df = output_df[output_df["time_step"] == time_step].drop(columns="time_step").reset_index(drop=True)
+            pd.testing.assert_frame_equal(time_step_df, expected_df)
+
+        with pytest.raises(ValueError) as err:
+            _ = Resampler(ResamplerParams(time_step=[1, 1], time_unit="days"))
+        assert "The time steps must be different" in str(err.value)
+        with pytest.raises(ValueError) as err:
+            _ = Resampler(params).transform(long_format_df.assign(time_step=1), TIME_COL, groupby_columns=[GROUP_COL])
+        assert "can not have a \"time_step\" column" in str(err.value)
+        with pytest.raises(ValueError) as err:
+            _ = Resampler(params).transform_incremental(long_format_df, TIME_COL, groupby_columns=[GROUP_COL])
+        assert "not available with several time steps" in str(err.value)
+
+    def test_transform_arrays(self):
+        rng = np.random.default_rng(0)
+        timestamps = pd.DatetimeIndex(pd.Timestamp("2021-01-01") + pd.to_timedelta(np.sort(rng.choice(600, size=40, replace=False)), unit="s"))
+        values = rng.normal(size=(40, 3))
+        values[rng.random((40, 3)) < 0.2] = np.nan
+        # a column with a single value is not interpolated
+        values[:, 2] = np.nan
+        values[4, 2] = 1.0
+        shuffled_rows = rng.permutation(40)
+        df = pd.DataFrame({TIME_COL: timestamps[shuffled_rows], "a": values[shuffled_rows, 0], "b": values[shuffled_rows, 1], "c": values[shuffled_rows, 2]})
+        for interpolation_method in ["linear", "time", "cubic", "previous", "constant"]:
+            for extrapolation_method in ["none", "clip", "interpolation", "no_extrapolation"]:
+                resampler = Resampler(ResamplerParams(interpolation_method=interpolation_method, extrapolation_method=extrapolation_method,
+                                                      time_step=7, time_unit="seconds"))
+                expected_df = resampler.transform(df, TIME_COL)
+                output_timestamps, output_values = resampler.transform_arrays(df[TIME_COL].values, df[["a", "b", "c"]].values)
+                np.testing.assert_array_equal(output_timestamps, expected_df[TIME_COL])
+                np.testing.assert_array_equal(output_values, expected_df[["a", "b", "c"]].values)
+
+        resampler = Resampler(ResamplerParams(time_step=7, time_unit="seconds"))
+        output_timestamps, output_values = resampler.transform_arrays(timestamps.tz_localize("CET").insert(0, pd.NaT), np.arange(41))
+        expected_df = resampler.transform(pd.DataFrame({TIME_COL: timestamps.tz_localize("CET"), DATA_COL: np.arange(1, 41)}), TIME_COL)
+        assert output_values.ndim == 1
+        pd.testing.assert_index_equal(output_timestamps, pd.DatetimeIndex(expected_df[TIME_COL]), check_names=False)
+        np.testing.assert_array_equal(output_values, expected_df[DATA_COL].values)
+        with pytest.raises(ValueError) as err:
+            _ = resampler.transform_arrays(timestamps[[0, 1, 1]], [1.0, 2.0, 3.0])
+        assert "duplicate timestamps" in str(err.value)
+
+    def test_output_memory_budget(self, long_format_df):
+        # a nanosecond time step on a few days would need billions of timestamps, the resampling fails without building them
+        params = ResamplerParams(time_step=1, time_unit="nanoseconds", max_output_memory_mb=100)
+        with pytest.raises(ValueError) as err:
+            _ = Resampler(params).transform(long_format_df, TIME_COL, groupby_columns=[GROUP_COL])
+        assert "more than the memory budget of 100 MB" in str(err.value)
+        with pytest.raises(ValueError) as err:
+            _ = list(Resampler(params).transform_chunks([long_format_df], TIME_COL, long_format_df[TIME_COL].min(), long_format_df[TIME_COL].max(),
+                                                        groupby_columns=[GROUP_COL]))
+        assert "more than the memory budget of 100 MB" in str(err.value)
+
+        resampler = Resampler(ResamplerParams(time_step=1, time_unit="hours", max_output_memory_mb=1))
+        output_df = resampler.transform(long_format_df, TIME_COL, groupby_columns=[GROUP_COL])
+        start_time, end_time = long_format_df[TIME_COL].min(), long_format_df[TIME_COL].max()
+        assert resampler._estimate_output_rows_number(long_format_df, TIME_COL, [GROUP_COL], start_time, end_time) == len(output_df)
+        resampler = Resampler(ResamplerParams(time_step=1, time_unit="hours", per_series_time_index=True))
+        output_df = resampler.transform(long_format_df, TIME_COL, groupby_columns=[GROUP_COL])
+        assert resampler._estimate_output_rows_number(long_format_df, TIME_COL, [GROUP_COL], start_time, end_time) == len(output_df)
+
+        with pytest.raises(ValueError) as err:
+            _ = Resampler(ResamplerParams(max_output_memory_mb=0))
+        assert "The output memory budget must be a positive number" in str(err.value)
@@ -2,7 +2,7 @@ import numpy as np
 import pandas as pd
 import pytest
 
-from dku_timeseries import Resampler
+from dku_timeseries import Resampler, ResamplerParams
 from recipe_config_loading import get_resampling_params
 
 
@@ -170,3 +170,180 @@ class TestResamplerLongFormat:
         datetime_column = config.get('datetime_column')
         output_df = resampler.transform(long_df_different_sizes, datetime_column, groupby_columns=groupby_columns)
         assert output_df.shape == (12,4)
+
+    def test_unsorted_interleaved_identifiers(self, long_df_2, params, config, datetime_column):
+        resampler = Resampler(params)
+        groupby_columns = ["country", "item"]
+        shuffled_df = long_df_2.iloc[[5, 0, 3, 2, 4, 1]].copy()
+        shuffled_df.loc[len(shuffled_df)] = [1, 1, None, "first", pd.Timestamp("1959-01-31")]
+        output_df = resampler.transform(shuffled_df, datetime_column, groupby_columns=groupby_columns)
+        expected_df = resampler.transform(long_df_2, datetime_column, groupby_columns=groupby_columns)
+        pd.testing.assert_frame_equal(output_df, expected_df)
+        np.testing.assert_array_equal(output_df["country"].values, ["first"] * 3 + ["second"] * 3 + ["third"] * 3)
+
+    def test_many_small_series(self, datetime_column):
+        # the time series are resampled together over flat arrays, with the same values as when they are resampled one by one
+        params = ResamplerParams(time_step=6, time_unit="hours", category_imputation_method="previous", custom_start_date=pd.Timestamp("2020-01-01"),
+                                 custom_end_date=pd.Timestamp("2020-01-03"))
+        rng = np.random.RandomState(0)
+        series_dfs = []
+        for series_number in range(200):
+            length = 2 + series_number % 6
+            values = rng.normal(size=length)
+            values[rng.rand(length) < 0.3] = np.nan
+            timestamps = pd.Timestamp("2020-01-01 01:00") + pd.to_timedelta(np.sort(rng.choice(40, length, replace=False)), unit="h")
+            series_dfs.append(pd.DataFrame({datetime_column: timestamps,
+                                            "country": "country_{:03d}".format(series_number), "value1": values, "value2": rng.normal(size=length),
+                                            "category": rng.choice(["a", "b", None], length)}))
+        long_df = pd.concat(series_dfs).sample(frac=1, random_state=0)
+        resampler = Resampler(params)
+        output_df = resampler.transform(long_df, datetime_column, groupby_columns=["country"])
+        expected_df = pd.concat([resampler.transform(series_df, datetime_column, groupby_columns=["country"]) for series_df in series_dfs], ignore_index=True)
+        pd.testing.assert_frame_equal(output_df, expected_df)
+        assert output_df["country"].nunique() == 200
+
+    def test_parallel_resampling(self, long_df_4, config, datetime_column):
+        groupby_columns = ["country", "item", "store"]
+        sequential_output_df = Resampler(get_resampling_params(config)).transform(long_df_4, datetime_column, groupby_columns=groupby_columns)
+        config["n_jobs"] = 2
+        parallel_output_df = Resampler(get_resampling_params(config)).transform(long_df_4, datetime_column, groupby_columns=groupby_columns)
+        pd.testing.assert_frame_equal(parallel_output_df, sequential_output_df)
+
+    def test_transform_chunks(self, long_df_4, params, config, datetime_column):
+        resampler = Resampler(params)
+        groupby_columns = ["country", "item", "store"]
+        sorted_df = long_df_4.sort_values(groupby_columns).reset_index(drop=True)
+        expected_df = resampler.transform(sorted_df, datetime_column, groupby_columns=groupby_columns)
+        for chunk_size in [1, 3, 8]:
+            chunks = [sorted_df.iloc[i:i + chunk_size] for i in range(0, len(sorted_df), chunk_size)]
+            output_chunks = list(resampler.transform_chunks(chunks, datetime_column, sorted_df[datetime_column].min(), sorted_df[datetime_column].max(),
+                                                            groupby_columns=groupby_columns))
+            output_df = pd.concat(output_chunks).reset_index(drop=True)
+            pd.testing.assert_frame_equal(output_df, expected_df)
+
+    def test_transform_chunks_unsorted(self, long_df_4, params, config, datetime_column):
+        resampler = Resampler(params)
+        groupby_columns = ["country"]
+        chunks = [long_df_4.iloc[i:i + 2] for i in range(0, len(long_df_4), 2)]
+        with pytest.raises(ValueError) as err:
+            _ = list(resampler.transform_chunks(chunks, datetime_column, long_df_4[datetime_column].min(), long_df_4[datetime_column].max(),
+                                                groupby_columns=groupby_columns))
+        assert "must be sorted by time series identifiers" in str(err.value)
+
+    def test_transform_chunks_single_series(self, df, params, config, datetime_column):
+        resampler = Resampler(params)
+        expected_df = resampler.transform(df, datetime_column)
+        chunks = [df.iloc[:1], df.iloc[1:]]
+        output_df = pd.concat(resampler.transform_chunks(chunks, datetime_column, df[datetime_column].min(), df[datetime_column].max()))
+        pd.testing.assert_frame_equal(output_df, expected_df)
+
+    def test_transform_incremental(self, config, datetime_column):
+        config["time_unit"] = "days"
+        config["time_step"] = 1
+        resampler = Resampler(get_resampling_params(config))
+        groupby_columns = ["country"]
+        time_index = pd.date_range("1-1-2020", periods=20, freq="36H")
+        values = np.arange(20, dtype=float) ** 2
+        values[[5, 6, 12]] = np.nan
+        long_df = pd.DataFrame({"value1": np.concatenate([values, -values[:15]]), "country": ["first"] * 20 + ["second"] * 15,
+                                datetime_column: time_index.append(time_index[3:18])})
+        expected_df = resampler.transform(long_df, datetime_column, groupby_columns=groupby_columns)
+
+        state = None
+        output_dfs = []
+        for run_end in ["1-8-2020", "1-20-2020", "1-30-2020"]:
+            new_rows = long_df[long_df[datetime_column] < run_end]
+            output_df, state = resampler.transform_incremental(new_rows, datetime_column, state=state, groupby_columns=groupby_columns)
+            output_dfs.append(output_df)
+        output_df = pd.concat(output_dfs).sort_values(groupby_columns + [datetime_column]).reset_index(drop=True)
+
+        # the rows after the last timestamp of each time series are extrapolated, and only emitted in a full computation
+        last_timestamps = long_df.groupby("country")[datetime_column].max()
+        is_final = expected_df[datetime_column].values <= last_timestamps.reindex(expected_df["country"]).values
+        pd.testing.assert_frame_equal(output_df, expected_df[is_final].reset_index(drop=True))
+
+        # the rows that were already processed are ignored
+        output_df, _ = resampler.transform_incremental(long_df, datetime_column, state=state, groupby_columns=groupby_columns)
+        assert len(output_df) == 0
+
+    def test_select_new_rows(self, config, datetime_column):
+        config["time_unit"] = "days"
+        config["time_step"] = 1
+        resampler = Resampler(get_resampling_params(config))
+        groupby_columns = ["country"]
+        long_df = pd.DataFrame({"value1": np.arange(12, dtype=float), "country": ["first", "second"] * 6,
+                                datetime_column: pd.date_range("1-1-2020", periods=12, freq="12H")})
+        chunks = [long_df.iloc[:5], long_df.iloc[5:]]
+        pd.testing.assert_frame_equal(resampler.select_new_rows(chunks, datetime_column, groupby_columns=groupby_columns), long_df)
+
+        _, state = resampler.transform_incremental(long_df.iloc[:7], datetime_column, groupby_columns=groupby_columns)
+        # the whole history is read again by chunks, and only the rows after the last processed row of each time series are kept
+        new_rows = resampler.select_new_rows(chunks, datetime_column, state=state, groupby_columns=groupby_columns)
+        pd.testing.assert_frame_equal(new_rows, long_df.iloc[7:].reset_index(drop=True))
+        expected_df, _ = resampler.transform_incremental(long_df, datetime_column, state=state, groupby_columns=groupby_columns)
+        output_df, _ = resampler.transform_incremental(new_rows, datetime_column, state=state, groupby_columns=groupby_columns)
+        pd.testing.assert_frame_equal(output_df, expected_df)
+
+    def test_transform_incremental_unavailable_method(self, long_df_4, config, datetime_column):
+        config["interpolation_method"] = "cubic"
+        resampler = Resampler(get_resampling_params(config))
+        with pytest.raises(ValueError) as err:
+            _ = resampler.transform_incremental(long_df_4, datetime_column, groupby_columns=["country"])
+        assert "Incremental resampling is not available" in str(err.value)
+
+    def test_per_series_time_index(self, config, datetime_column):
+        config["time_unit"] = "days"
+        config["time_step"] = 1
+        long_df = pd.DataFrame({"value1": [1.0, 2.0, 3.0, 10.0, 20.0], "country": ["first"] * 3 + ["second"] * 2,
+                                datetime_column: pd.to_datetime(["2020-01-01", "2020-01-03", "2020-01-04", "2020-01-06", "2020-01-08"])})
+        common_output_df = Resampler(get_resampling_params(config)).transform(long_df, datetime_column, groupby_columns=["country"])
+        assert len(common_output_df) == 2 * 8
+        config["per_series_time_index"] = True
+        output_df = Resampler(get_resampling_params(config)).transform(long_df, datetime_column, groupby_columns=["country"])
+        np.testing.assert_array_equal(output_df["value1"].values, [1.0, 1.5, 2.0, 3.0, 10.0, 15.0, 20.0])
+        expected_dates = pd.date_range("2020-01-01", periods=4, freq="D").append(pd.date_range("2020-01-06", periods=3, freq="D"))
+        np.testing.assert_array_equal(output_df[datetime_column].values, expected_dates.values)
+        np.testing.assert_array_equal(output_df["country"].values, ["first"] * 4 + ["second"] * 3)
+
+        with pytest.raises(ValueError) as err:
+            _ = Resampler(get_resampling_params(config)).transform_incremental(long_df, datetime_column, groupby_columns=["country"])
+        assert "Incremental resampling is not available" in str(err.value)
+
+    def test_per_series_time_index_staggered_starts(self, config, datetime_column):
+        config["time_unit"] = "seconds"
+        config["time_step"] = 30
+        config["interpolation_method"] = "time"
+        config["per_series_time_index"] = True
+        timestamps = pd.to_datetime(["2020-01-01 00:00:00", "2020-01-01 00:01:00", "2020-01-01 00:00:20", "2020-01-01 00:01:20"])
+        long_df = pd.DataFrame({datetime_column: timestamps, "value1": [1.0, 3.0, 10.0, 16.0], "country": ["first"] * 2 + ["second"] * 2})
+        output_df = Resampler(get_resampling_params(config)).transform(long_df, datetime_column, groupby_columns=["country"])
+        # the second time series keeps the time steps of the first one instead of starting on its own first timestamp
+        expected_dates = pd.to_datetime(["2020-01-01 00:00:00", "2020-01-01 00:00:30", "2020-01-01 00:01:00", "2020-01-01 00:00:30",
+                                         "2020-01-01 00:01:00"])
+        np.testing.assert_array_equal(output_df[datetime_column].values, expected_dates.values)
+        np.testing.assert_allclose(output_df["value1"].values, [1.0, 2.0, 3.0, 11.0, 14.0])
+
+        config["downsampling_method"] = "mean"
+        output_df = Resampler(get_resampling_params(config)).transform(long_df, datetime_column, groupby_columns=["country"])
+        expected_dates = pd.to_datetime(["2020-01-01 00:00:00", "2020-01-01 00:00:30", "2020-01-01 00:01:00"] * 2)
+        np.testing.assert_array_equal(output_df[datetime_column].values, expected_dates.values)
+        np.testing.assert_array_equal(output_df["value1"].values, [1.0, np.nan, 3.0, 10.0, np.nan, 16.0])
+
+    def test_shared_timestamps(self, config, datetime_column):
+        config["time_unit"] = "hours"
+        config["time_step"] = 5
+        config["category_imputation_method"] = "previous"
+        timestamps = pd.to_datetime(["2020-01-01 00:00", "2020-01-01 03:00", "2020-01-01 11:00", "2020-01-01 12:00", "2020-01-01 23:00"])
+        long_df = pd.DataFrame({datetime_column: np.tile(timestamps, 3), "country": np.repeat(["first", "second", "third"], 5),
+                                "value1": [1.0, np.nan, 3.0, 4.0, 5.0, 10.0, 20.0, np.nan, 40.0, np.nan, np.nan, 7.0, np.nan, np.nan, np.nan],
+                                "category": ["a", None, "b", None, "c"] * 3}).sample(frac=1, random_state=0)
+        resampler = Resampler(get_resampling_params(config))
+        segment_starts, segment_ends = np.array([0, 5, 10]), np.array([5, 10, 15])
+        assert resampler._has_shared_timestamps(np.tile(timestamps, 3), segment_starts, segment_ends)
+        assert not resampler._has_shared_timestamps(timestamps.append(timestamps).append(timestamps + pd.Timedelta(hours=1)), segment_starts, segment_ends)
+        output_df = resampler.transform(long_df, datetime_column, groupby_columns=["country"])
+        # the time series are resampled together, with the same values as when they are resampled one by one
+        resampler._has_shared_timestamps = lambda *args: False
+        pd.testing.assert_frame_equal(output_df, resampler.transform(long_df, datetime_column, groupby_columns=["country"]))
+        np.testing.assert_allclose(output_df["value1"].values[:5], [1.0, 2.0, 2.5, 13 / 3, 14 / 3])
+        assert output_df["category"].tolist()[:5] == ["a", "a", "a", "b", "b"]
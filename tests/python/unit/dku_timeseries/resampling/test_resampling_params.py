@@ -25,6 +25,16 @@ class TestResamplerParams:
             _ = get_resampling_params(config)
         assert "Time step can not be null or negative" in str(err.value)
 
+    def test_additional_time_steps(self, config):
+        config["additional_time_steps"] = ["1", "4"]
+        params = get_resampling_params(config)
+        assert params.time_steps == [2, 1.0, 4.0]
+        assert [time_step_params.time_step for time_step_params in params.get_time_step_params()] == [6, 3, 12]
+        config["additional_time_steps"] = ["one"]
+        with pytest.raises(ValueError) as err:
+            _ = get_resampling_params(config)
+        assert "The additional time steps must be numbers" in str(err.value)
+
     def test_quarter_params(self, config):
         params = get_resampling_params(config)
         assert params.time_step == 6
@@ -90,3 +100,22 @@ class TestResamplerParams:
         config["custom_start_date"] = "2025-01-30T11:00:00Z"
         params = get_resampling_params(config)
         assert params.custom_start_date == pd.Timestamp("2025-01-31T00:00:00Z")
+
+    def test_n_jobs_params(self, config):
+        params = get_resampling_params(config)
+        assert params.n_jobs == 1
+        config["n_jobs"] = -1
+        params = get_resampling_params(config)
+        assert params.get_n_jobs() >= 1
+        config["n_jobs"] = 0
+        with pytest.raises(ValueError) as err:
+            _ = get_resampling_params(config)
+        assert "Number of processes must be a positive integer" in str(err.value)
+
+    def test_downsampling_method_params(self, config):
+        params = get_resampling_params(config)
+        assert params.downsampling_method == "interpolation"
+        config["downsampling_method"] = "median"
+        with pytest.raises(ValueError) as err:
+            _ = get_resampling_params(config)
+        assert "Possible downsampling methods are" in str(err.value)
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from dku_timeseries.dataframe_helpers import has_duplicates, is_sorted_by_time, sort_by_time, sort_by_time_index, sort_by_segments, get_last_timestamps, \
+    drop_rows_until
+
+
+class TestDataframeHelpers:
+    def test_has_duplicates(self):
+        timestamps = pd.to_datetime(['2021-01-03', '2021-01-01', '2021-01-02', '2021-01-01'])
+        assert has_duplicates(pd.DataFrame({'t': timestamps}), 't')
+        assert not has_duplicates(pd.DataFrame({'t': timestamps[:3]}), 't')
+        assert not has_duplicates(pd.DataFrame({'t': timestamps[:3].sort_values().tz_localize('CET')}), 't')
+        assert has_duplicates(pd.DataFrame({'t': [pd.NaT, pd.Timestamp('2021-01-01'), pd.NaT]}), 't')
+        # non datetime columns, e.g. before the conversion of strings to datetimes
+        assert has_duplicates(pd.DataFrame({'t': ['2021-01-01', '2021-01-02', '2021-01-01']}), 't')
+        assert not has_duplicates(pd.DataFrame({'t': ['2021-01-01', '2021-01-02']}), 't')
+        assert not has_duplicates(pd.DataFrame({'t': pd.to_datetime([])}), 't')
+
+    def test_sort_by_time(self):
+        df = pd.DataFrame({'t': pd.date_range('2021-01-01', periods=5, freq='D'), 'value': np.arange(5)})
+        assert sort_by_time(df, 't') is df
+        shuffled_df = df.iloc[[2, 0, 4, 1, 3]]
+        pd.testing.assert_frame_equal(sort_by_time(shuffled_df, 't'), df)
+        indexed_df = shuffled_df.set_index('t')
+        pd.testing.assert_frame_equal(sort_by_time_index(indexed_df), df.set_index('t'))
+        sorted_indexed_df = df.set_index('t')
+        assert sort_by_time_index(sorted_indexed_df) is sorted_indexed_df
+
+    def test_null_timestamps_are_sorted_last(self):
+        timestamps = pd.DatetimeIndex([pd.NaT, pd.Timestamp('2021-01-01')])
+        assert not is_sorted_by_time(timestamps)
+        df = pd.DataFrame({'t': timestamps, 'value': [0, 1]})
+        assert sort_by_time(df, 't')['value'].tolist() == [1, 0]
+
+    def test_sort_by_segments_sorted_input(self):
+        df = pd.DataFrame({
+            'id': ['a', 'a', 'b', 'b', 'b'],
+            't': pd.to_datetime(['2021-01-01', '2021-01-02', '2021-01-01', '2021-01-02', '2021-01-03'])
+        })
+        sorted_positions, segment_starts, segment_ends, _, _ = sort_by_segments(df, ['id'], 't')
+        np.testing.assert_array_equal(sorted_positions, np.arange(5))
+        np.testing.assert_array_equal(segment_starts, [0, 2])
+        np.testing.assert_array_equal(segment_ends, [2, 5])
+        sorted_positions, _, _, _, _ = sort_by_segments(df.iloc[::-1], ['id'], 't')
+        np.testing.assert_array_equal(sorted_positions, [4, 3, 2, 1, 0])
+
+    def test_drop_rows_until_last_timestamps(self):
+        df = pd.DataFrame({
+            'id': ['a', 'b', 'a', 'b', 'c', None],
+            't': pd.to_datetime(['2021-01-01', '2021-01-02', '2021-01-03', '2021-01-04', '2021-01-01', '2021-01-05'])
+        })
+        last_rows = get_last_timestamps([df.iloc[:2], df.iloc[2:4], df.iloc[4:]], 't', ['id'])
+        assert list(zip(last_rows['id'], last_rows['t'])) == [('a', pd.Timestamp('2021-01-03')), ('b', pd.Timestamp('2021-01-04')),
+                                                               ('c', pd.Timestamp('2021-01-01'))]
+        new_df = pd.DataFrame({'id': ['a', 'a', 'b', 'd'], 't': pd.to_datetime(['2021-01-03', '2021-01-04', '2021-01-04', '2021-01-01'])})
+        assert drop_rows_until(new_df, last_rows, 't', ['id']).index.tolist() == [1, 3]
+
+        last_rows = get_last_timestamps([df.iloc[:3], df.iloc[3:]], 't', [])
+        assert last_rows['t'].tolist() == [pd.Timestamp('2021-01-05')]
+        assert len(drop_rows_until(new_df, last_rows, 't', [])) == 0
+        assert drop_rows_until(new_df, get_last_timestamps([], 't', ['id']), 't', ['id']) is new_df
@@ -0,0 +1,28 @@
+import logging
+
+import numpy as np
+
+from dku_timeseries.memory_helpers import get_peak_memory_mb, get_current_memory_mb, log_stage_memory
+
+
+class TestMemoryHelpers:
+    def test_peak_memory(self):
+        peak_memory = get_peak_memory_mb()
+        assert peak_memory is None or peak_memory > 0
+        peak_memory_with_children = get_peak_memory_mb(include_children=True)
+        assert peak_memory is None or peak_memory_with_children >= peak_memory
+        current_memory = get_current_memory_mb()
+        assert current_memory is None or 0 < current_memory
+
+    def test_log_stage_memory(self, caplog):
+        caplog.set_level(logging.INFO, logger="dku_timeseries.memory_helpers")
+        log_stage_memory("a first stage")
+        # the stage after a large allocation logs the growth of the peak memory during this stage only, none when it releases memory
+        values = np.ones(64 * 1024 * 1024 // 8)
+        log_stage_memory("an allocation")
+        del values
+        log_stage_memory("a release")
+        if get_peak_memory_mb() is not None:
+            messages = [record.getMessage() for record in caplog.records]
+            assert messages[-2].startswith("Memory after an allocation:")
+            assert "peak memory grown by 0.0 MB during this stage" in messages[-1]
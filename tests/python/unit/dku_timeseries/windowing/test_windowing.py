@@ -129,3 +129,27 @@ class TestWindowing:
         output_1 = output_df.groupby(GROUP_COL).get_group('group_1').data_col_min.values[:10]
         assert math.isnan(output_1[0])
         assert np.array_equal(output_1[1:], ground_truth[1:])
+
+    def test_min_max_closed_options(self):
+        data = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8, 9, 7, 9]
+        df = _make_df_with_one_col(data)
+        reference_df = df.set_index(TIME_COL)
+        for closed_option in ['left', 'right', 'both', 'neither']:
+            params = dku_timeseries.WindowAggregatorParams(window_width=3, closed_option=closed_option, aggregation_types=['min', 'max'])
+            output_df = dku_timeseries.WindowAggregator(params).compute(df, TIME_COL)
+            roller = reference_df[DATA_COL].rolling('3s', closed=closed_option)
+            assert np.array_equal(output_df[DATA_COL + '_min'].values, roller.apply(min, raw=True).values, equal_nan=True)
+            assert np.array_equal(output_df[DATA_COL + '_max'].values, roller.apply(max, raw=True).values, equal_nan=True)
+
+        params = dku_timeseries.WindowAggregatorParams(causal_window=False, window_width=3, aggregation_types=['min', 'max'])
+        output_df = dku_timeseries.WindowAggregator(params).compute(df, TIME_COL)
+        assert np.array_equal(output_df[DATA_COL + '_min'].values, [np.nan, 1, 1, 1, 1, 2, 2, 2, 3, 3, 3, 5, 7, 7, np.nan], equal_nan=True)
+        assert np.array_equal(output_df[DATA_COL + '_max'].values, [np.nan, 4, 4, 5, 9, 9, 9, 6, 6, 5, 8, 9, 9, 9, np.nan], equal_nan=True)
+
+    def test_min_max_missing_values(self):
+        df = _make_df_with_one_col([np.nan, 2, 1, np.nan, 5, 4])
+        params = dku_timeseries.WindowAggregatorParams(window_width=3, closed_option='right', aggregation_types=['min', 'max'])
+        output_df = dku_timeseries.WindowAggregator(params).compute(df, TIME_COL)
+        # missing values are skipped, as for the other aggregations
+        assert np.array_equal(output_df[DATA_COL + '_min'].values, [np.nan, 2, 1, 1, 1, 4], equal_nan=True)
+        assert np.array_equal(output_df[DATA_COL + '_max'].values, [np.nan, 2, 2, 2, 5, 5], equal_nan=True)